@@ -0,0 +1,191 @@
+#   Batch Mode
+# Builds graphs from specs and runs actions on them without any prompts, every result is
+# plain JSON data. Used by `menu.py --actions ...` and `menu.py --script jobs.json`.
+#
+# A graph spec is a dict with a "source":
+#   {"source": "generate", "type": "edge_list", "nodes": 100, "saturation": 30, "seed": 1}
+#   {"source": "file", "path": "graph.txt"}          type and node count come from the file
+#   {"source": "stdin", "type": "adjacency_table"}   adjacency lines on stdin
+#   {"source": "binary", "path": "graph.bin"}        file written by the save command
+# Actions are strings, arguments separated with colons:
+#   find:U:V, bfs[:START], dfs[:START], kahn, tarjan, export[:FORMAT], node_count,
+#   predecessors:V, ancestors:V
+#
+# run_pool() spreads jobs over worker processes. Specs are small and each worker builds
+# its own graph; graphs that only exist in this process (already built ones, stdin) are
+# sent as the compact CSR bytes of graph_io.dumps_graph() rather than pickled objects.
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from graph import (Graph, GraphAdjTable, GraphBitMatrix, GraphCSR, GraphCycleError, GraphEdgeList, GraphMatrix,
+                   generate_random_acyclic_graph)
+from graph_io import ParseReport, dumps_graph, export_graph, load_adjacency, loads_graph
+
+GRAPH_TYPES = {
+    "matrix": GraphMatrix,
+    "bit_matrix": GraphBitMatrix,
+    "edge_list": GraphEdgeList,
+    "adjacency_table": GraphAdjTable,
+    "csr": GraphCSR,
+}
+
+def graph_class(type_name):
+    if type_name not in GRAPH_TYPES:
+        raise ValueError(f"Unknown graph type: {type_name}. Allowed types: {', '.join(GRAPH_TYPES)}")
+    return GRAPH_TYPES[type_name]
+
+def build_graph(spec):
+    # Returns (graph, info), info being extra JSON data about the build such as the parse report
+    source = spec.get("source", "generate")
+    info = {}
+    if source == "generate":
+        saturation = spec.get("saturation", 50)
+        if not 0 <= saturation <= 100:
+            raise ValueError("Saturation must be between 0 and 100.")
+        graph = generate_random_acyclic_graph(int(spec["nodes"]), saturation / 100,
+                                              graph_class(spec.get("type", "matrix")), spec.get("seed"))
+    elif source == "file":
+        report = ParseReport()
+        with open(spec["path"]) as f:
+            type_name = f.readline().strip().lower()
+            nodes = int(f.readline().strip())
+            graph = load_adjacency(f, graph_class(spec.get("type", type_name)), nodes, report)
+        info["parse"] = report.as_dict()
+    elif source == "stdin":
+        report = ParseReport()
+        graph = load_adjacency(sys.stdin, graph_class(spec.get("type", "matrix")), spec.get("nodes"), report)
+        info["parse"] = report.as_dict()
+    elif source == "binary":
+        graph = GraphCSR.load(spec["path"])
+    else:
+        raise ValueError(f"Unknown graph source: {source}")
+    return graph, info
+
+def check_node(graph, param):
+    # Same range check as the interactive find(); list-backed rows would wrap negative ids
+    node = int(param)
+    if not 0 <= node < len(graph.get_all_nodes()):
+        raise IndexError(f"Node {node} is out of range")
+    return node
+
+def run_action(graph, action):
+    name, *params = action.strip().lower().split(":")
+    name = name.replace(" ", "_").replace("-", "_")
+    if name == "find":
+        u, v = params
+        return graph.has_edge(check_node(graph, u), check_node(graph, v))
+    if name in ("bfs", "breadth_first_search"):
+        return list(graph.iter_bfs(check_node(graph, params[0] if params else 0)))
+    if name in ("dfs", "depth_first_search"):
+        return list(graph.iter_dfs(check_node(graph, params[0] if params else 0)))
+    if name == "kahn":
+        return graph.topological_sort()
+    if name == "tarjan":
+        return graph.topological_sort_dfs()
+    if name == "export":
+        out = io.StringIO()
+        export_graph(graph, out, params[0] if params else "tikz")
+        return out.getvalue()
+    if name == "predecessors":
+        return list(graph.get_predecessors(check_node(graph, params[0])))
+    if name == "ancestors":
+        return graph.ancestors(check_node(graph, params[0]))
+    if name == "node_count":
+        return len(graph.get_all_nodes())
+    raise ValueError(f"Unknown action: {action}")
+
+def run_actions(graph, actions):
+    results = []
+    for action in actions:
+        start = time.perf_counter()
+        entry = {"action": action}
+        try:
+            entry["result"] = run_action(graph, action)
+        except GraphCycleError as e:
+            entry["error"] = str(e)
+            entry["edge"] = e.edge
+        except (ValueError, IndexError, KeyError, TypeError) as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["seconds"] = time.perf_counter() - start
+        results.append(entry)
+    return results
+
+def run_job(spec, actions, payload=None):
+    # payload, when given, is a graph serialized with dumps_graph() and spec only describes it
+    job = {"graph": spec}
+    start = time.perf_counter()
+    try:
+        if payload is not None:
+            graph, info = loads_graph(payload), {}
+        else:
+            graph, info = build_graph(spec)
+    except (OSError, ValueError, KeyError) as e:
+        job["error"] = f"{type(e).__name__}: {e}"
+        return job
+    job["build_seconds"] = time.perf_counter() - start
+    job.update(info)
+    job["node_count"] = len(graph.get_all_nodes())
+    job["results"] = run_actions(graph, actions)
+    return job
+
+def load_script(path):
+    # A script is a JSON list of jobs, or {"jobs": [...]}; each job is {"graph": spec, "actions": [...]}
+    with open(path) as f:
+        script = json.load(f)
+    jobs = script["jobs"] if isinstance(script, dict) else script
+    return [(job["graph"], job.get("actions", [])) for job in jobs]
+
+def _run_packed_job(job):
+    return run_job(*job)
+
+def run_pool(jobs, workers=None, chunksize=1):
+    """
+    Runs (spec, actions) jobs on a pool of worker processes and aggregates the results.
+
+    :param jobs: Iterable of (spec, actions); spec may also be a Graph object
+    :param workers: Number of processes, os.cpu_count() by default
+    :param chunksize: Jobs handed to a worker at once, raise it for many small jobs
+    :return: {"jobs": [...], "summary": {...}} with jobs in the input order
+    """
+    packed = []
+    # Jobs whose graph could not even be built here, by position, reported like run_job() does
+    rejected = {}
+    for i, (spec, actions) in enumerate(jobs):
+        payload = None
+        try:
+            if isinstance(spec, Graph):
+                spec, graph = {"source": "serialized"}, spec
+                payload = dumps_graph(graph)
+            elif spec.get("source") == "stdin":
+                # Workers do not share our stdin, read it here once
+                graph, info = build_graph(spec)
+                payload, spec = dumps_graph(graph), dict(spec, **info)
+        except (OSError, ValueError, KeyError) as e:
+            rejected[i] = {"graph": spec, "error": f"{type(e).__name__}: {e}"}
+            continue
+        packed.append((spec, list(actions), payload))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        done = iter(executor.map(_run_packed_job, packed, chunksize=chunksize))
+        results = [rejected[i] if i in rejected else next(done) for i in range(len(packed) + len(rejected))]
+    wall_seconds = time.perf_counter() - start
+
+    failed = sum(1 for job in results if "error" in job)
+    action_errors = sum(1 for job in results for entry in job.get("results", ()) if "error" in entry)
+    busy_seconds = sum(job.get("build_seconds", 0.0) + sum(entry["seconds"] for entry in job.get("results", ()))
+                       for job in results)
+    return {
+        "jobs": results,
+        "summary": {
+            "jobs": len(results),
+            "failed_jobs": failed,
+            "failed_actions": action_errors,
+            "workers": workers or os.cpu_count(),
+            "wall_seconds": wall_seconds,
+            "busy_seconds": busy_seconds,
+        },
+    }
@@ -0,0 +1,151 @@
+#   Benchmark
+# Times the graph backends over a sweep of node counts and saturations and writes the
+# results as JSON. With --baseline the run is compared against an earlier JSON file and
+# the exit code is 1 when any operation got slower than the allowed tolerance.
+#
+#   python benchmark.py --nodes 100 500 --saturation 0.05 0.3 --output bench.json
+#   python benchmark.py --baseline bench.json
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from graph import (GraphAdjTable, GraphBitMatrix, GraphCSR, GraphEdgeList, GraphMatrix,
+                   adj_table_to_edge_list, adj_table_to_matrix, edge_list_to_adj_table,
+                   edge_list_to_matrix, generate_random_acyclic_graph, matrix_to_adj_table,
+                   matrix_to_edge_list)
+
+BACKENDS = {
+    "matrix": GraphMatrix,
+    "bit_matrix": GraphBitMatrix,
+    "edge_list": GraphEdgeList,
+    "adjacency_table": GraphAdjTable,
+    "csr": GraphCSR,
+}
+
+CONVERTERS = {
+    "matrix": {"matrix_to_edge_list": matrix_to_edge_list, "matrix_to_adj_table": matrix_to_adj_table},
+    "edge_list": {"edge_list_to_matrix": lambda g: edge_list_to_matrix(g, len(g.get_all_nodes())),
+                  "edge_list_to_adj_table": edge_list_to_adj_table},
+    "adjacency_table": {"adj_table_to_matrix": adj_table_to_matrix, "adj_table_to_edge_list": adj_table_to_edge_list},
+}
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def cold(graph, fn):
+    # Drops the derived-result caches before every call, so repeats measure the real work
+    def run():
+        graph._cache = graph._neighbor_cache = None
+        return fn()
+    return run
+
+def consume(iterator):
+    for _ in iterator:
+        pass
+
+def bench_backend(name, nodes, saturation, seed, repeat, queries):
+    graph_class = BACKENDS[name]
+    results = {}
+    results["generate"] = best_time(lambda: generate_random_acyclic_graph(nodes, saturation, graph_class, seed), repeat)
+    graph = generate_random_acyclic_graph(nodes, saturation, graph_class, seed)
+    edges = list(graph.iter_edges())
+    results["from_edges"] = best_time(lambda: graph_class.from_edges(edges, nodes), repeat)
+
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(nodes), rng.randrange(nodes)) for _ in range(queries)] if nodes else []
+    results["has_edge"] = best_time(cold(graph, lambda: [graph.has_edge(u, v) for u, v in pairs]), repeat)
+    results["get_neighbors"] = best_time(cold(graph, lambda: [graph.get_neighbors(u) for u in range(nodes)]), repeat)
+    results["bfs"] = best_time(cold(graph, lambda: consume(graph.iter_bfs(*range(nodes)))), repeat)
+    results["dfs"] = best_time(cold(graph, lambda: consume(graph.iter_dfs(*range(nodes)))), repeat)
+    results["kahn"] = best_time(cold(graph, graph.topological_sort), repeat)
+    results["tarjan"] = best_time(cold(graph, graph.topological_sort_dfs), repeat)
+    with open(os.devnull, "w") as devnull:
+        results["export"] = best_time(cold(graph, lambda: graph.export(devnull)), repeat)
+    for converter_name, converter in CONVERTERS.get(name, {}).items():
+        results[converter_name] = best_time(cold(graph, lambda: converter(graph)), repeat)
+    return results
+
+def run(args):
+    results = []
+    for nodes in args.nodes:
+        for saturation in args.saturation:
+            for name in args.backends:
+                timings = bench_backend(name, nodes, saturation, args.seed, args.repeat, args.queries)
+                for operation, seconds in timings.items():
+                    results.append({
+                        "backend": name,
+                        "nodes": nodes,
+                        "saturation": saturation,
+                        "operation": operation,
+                        "seconds": seconds,
+                    })
+                print(f"{name:>16} nodes={nodes} saturation={saturation} done", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "queries": args.queries,
+        },
+        "results": results,
+    }
+
+def compare(report, baseline, tolerance, min_seconds):
+    # Returns the results that got slower than baseline * tolerance, ignoring
+    # operations too fast for the difference to be more than timer noise
+    key = lambda r: (r["backend"], r["nodes"], r["saturation"], r["operation"])
+    old = {key(r): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = old.get(key(result))
+        if before is None:
+            continue
+        if result["seconds"] > before * tolerance and result["seconds"] - before > min_seconds:
+            regressions.append(dict(result, baseline=before, ratio=result["seconds"] / before if before else float("inf")))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the graph backends")
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--saturation', type=float, nargs='+', default=[0.05, 0.3])
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the best one is kept')
+    parser.add_argument('--queries', type=int, default=10000, help='Number of random has_edge queries')
+    parser.add_argument('--output', type=str, help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', type=str, help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Allowed slowdown factor against the baseline')
+    parser.add_argument('--min-seconds', type=float, default=0.001, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_seconds)
+        for r in regressions:
+            print(f"REGRESSION {r['backend']} nodes={r['nodes']} saturation={r['saturation']} {r['operation']}: "
+                  f"{r['baseline']:.6f}s -> {r['seconds']:.6f}s ({r['ratio']:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against the baseline", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
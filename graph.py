@@ -1,9 +1,171 @@
 #   Graph Class
 import math
+import sys
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from copy import copy
+from heapq import heapify, heappop, heappush
+from itertools import compress, islice
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only GraphMatrix(use_numpy=True) needs it
+    np = None
+
+
+class GraphCycleError(ValueError):
+    # Raised by the topological sorts; edge is an offending (u, v) when one is known
+    def __init__(self, message="Graph has a cycle. Topological sorting is not possible.", edge=None):
+        super().__init__(message)
+        self.edge = edge
+
+
+def _edge_arrays(edges):
+    # Packs an iterable of (u, v) pairs into two flat int buffers
+    sources = array('i')
+    targets = array('i')
+    for u, v in edges:
+        sources.append(u)
+        targets.append(v)
+    return sources, targets
+
+def _count_nodes(sources, targets):
+    return max(max(sources, default=-1), max(targets, default=-1)) + 1
+
+
+class GraphStats:
+    # Filled in by Graph.enable_stats(): how often each primitive was called, and
+    # wall time plus peak traced memory of every algorithm run
+    def __init__(self):
+        self.calls = {}
+        self.runs = {}
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def record_run(self, name, seconds, peak_bytes):
+        run = self.runs.setdefault(name, {"runs": 0, "total_seconds": 0.0, "last_seconds": 0.0, "peak_bytes": None})
+        run["runs"] += 1
+        run["total_seconds"] += seconds
+        run["last_seconds"] = seconds
+        if peak_bytes is not None:
+            run["peak_bytes"] = max(run["peak_bytes"] or 0, peak_bytes)
+
+    def reset(self):
+        self.calls.clear()
+        self.runs.clear()
+
+    def report(self):
+        lines = ["Calls:"]
+        for name, count in sorted(self.calls.items()):
+            lines.append(f"  {name:<22} {count}")
+        lines.append("Runs:")
+        for name, run in sorted(self.runs.items()):
+            peak = f"{run['peak_bytes'] / 1024:.1f} KiB" if run["peak_bytes"] is not None else "-"
+            lines.append(f"  {name:<22} {run['runs']} runs, last {run['last_seconds']:.6f}s, "
+                         f"total {run['total_seconds']:.6f}s, peak memory {peak}")
+        return "\n".join(lines)
+
+
+def _counted(method, name, stats):
+    def wrapper(*args, **kwargs):
+        stats.count(name)
+        return method(*args, **kwargs)
+    return wrapper
+
+def _read_only(*args, **kwargs):
+    raise TypeError("Graph snapshots are read-only, change the live graph instead")
+
+def _timed(method, name, stats, trace_memory):
+    def wrapper(*args, **kwargs):
+        # Only the outermost run traces memory, nested runs (Kahn -> topological_sort) just time
+        tracing = trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            stats.record_run(name, seconds, peak)
+    return wrapper
+
+
+class ResultCache:
+    # Bounded LRU of results derived from a graph. Entries are only valid for the graph
+    # version they were computed at, the first lookup with a newer version drops them all.
+    # weigh(value) is how much of maxsize an entry takes up, 1 per entry by default.
+    def __init__(self, maxsize, weigh=None):
+        self.maxsize = maxsize
+        self.weigh = weigh
+        self.weight = 0
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, compute):
+        entries = self.entries
+        if version != self.version:
+            entries.clear()
+            self.weight = 0
+            self.version = version
+        elif key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = compute()
+        weigh = self.weigh
+        entries[key] = value
+        self.weight += weigh(value) if weigh else 1
+        while self.weight > self.maxsize:
+            _, old = entries.popitem(last=False)
+            self.weight -= weigh(old) if weigh else 1
+        return value
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "weight": self.weight, "maxsize": self.maxsize}
+
+
 class Graph:
+    # Set by enable_stats(); while disabled no wrapper is installed, so there is no overhead
+    stats = None
+    COUNTED_METHODS = ("add_edge", "has_edge", "get_neighbors", "get_predecessors", "calculate_in_degrees", "get_all_nodes")
+    TIMED_METHODS = ("BFS", "DFS", "Kahn", "Tarjan", "export", "topological_sort", "topological_sort_dfs")
+    # Every mutation bumps _version; derived results (topological orders, the frozen CSR copy,
+    # GraphMatrix neighbor rows) are memoized in ResultCaches keyed on it. The neighbor
+    # cache is capped by the number of node ids it holds over all rows, not by row count.
+    CACHE_SIZE = 32
+    NEIGHBOR_CACHE_ENTRIES = 1 << 16
+    _version = 0
+    _cache = None
+    _neighbor_cache = None
+    # Copy-on-write state of the row-based backends: every snapshot() starts a new epoch
+    # and a row whose _row_epoch is older may still be seen by a snapshot
+    _epoch = 0
+    _row_epoch = None
+    # Set on snapshot() views, whose getters must not hand out rows shared with the live graph
+    _is_snapshot = False
+    # Optional reverse index {v: {u: None}}, kept up to date by the edge mutators once
+    # enable_reverse_index() has built it
+    _pred = None
+
     def add_edge(self, u, v):
         raise NotImplementedError
 
+    def remove_edge(self, u, v):
+        # Returns whether the edge was there; removing a missing edge is not an error
+        raise NotImplementedError
+
     def has_edge(self, u, v):
         raise NotImplementedError
 
@@ -15,316 +177,1498 @@ class Graph:
     
     def calculate_in_degrees(self):
         raise NotImplementedError
+
+    def _in_degree_counts(self):
+        # Scratch copy of the in-degrees that the sort is allowed to decrement,
+        # backends with dense 0..n-1 nodes hand out a plain list instead of a dict
+        return self.calculate_in_degrees()
     
     def add_edges(self, l):
         for u, v in l:
             self.add_edge(u, v)
-    
 
-    def export(self):
-        print("Eksportuję graf do TikZ:\n")
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False):
+        # Generic bulk build, the backends override it with one pass straight into their storage
+        graph = cls(num_nodes or 0)
+        graph.add_edges(dict.fromkeys((u, v) for u, v in edges) if dedupe else edges)
+        return graph
 
-        # Użyjemy self.n jeśli jest, w przeciwnym razie spróbujemy get_all_nodes()
-        if hasattr(self, 'n'):
-            nodes = list(range(self.n))
-        else:
-            nodes = list(self.get_all_nodes())
+    @classmethod
+    def from_arrays(cls, sources, targets, num_nodes=None, dedupe=False):
+        return cls.from_edges(zip(sources, targets), num_nodes, dedupe)
+
+    def iter_edges(self):
+        for u in self.get_all_nodes():
+            for v in self.get_neighbors(u):
+                yield u, v
 
-        tikz = ["\\begin{tikzpicture}[->,>=stealth,shorten >=1pt,auto,node distance=2cm, thick, main node/.style={circle,draw}]"]
+    def enable_stats(self, trace_memory=False):
+        # Shadows the methods with counting/timing wrappers on this instance only.
+        # trace_memory=True also records peak memory, but tracemalloc slows every
+        # allocation down several times, so the recorded times are then inflated.
+        stats = self.stats if self.stats is not None else GraphStats()
+        self.disable_stats()
+        self.stats = stats
+        for name in self.COUNTED_METHODS:
+            setattr(self, name, _counted(getattr(self, name), name, stats))
+        for name in self.TIMED_METHODS:
+            setattr(self, name, _timed(getattr(self, name), name, stats, trace_memory))
+        return stats
 
-        # Umieszczamy wierzchołki na okręgu
-        angle_step = 360 / len(nodes)
-        for i in nodes:
-            angle = i * angle_step
-            x = round(5 * math.cos(math.radians(angle)), 2)
-            y = round(5 * math.sin(math.radians(angle)), 2)
-            tikz.append(f"\\node[main node] ({i}) at ({x},{y}) {{{i}}};")
+    def disable_stats(self):
+        # Drops the wrappers, the collected numbers stay readable in self.stats
+        for name in self.COUNTED_METHODS + self.TIMED_METHODS:
+            self.__dict__.pop(name, None)
 
-        # Dodajemy krawędzie
-        for i in nodes:
-            for j in nodes:
-                if self.has_edge(i, j):
-                    tikz.append(f"\\path[->] ({i}) edge ({j});")
+    def stats_enabled(self):
+        return "get_neighbors" in self.__dict__
 
-        tikz.append("\\end{tikzpicture}")
+    def _changed(self):
+        self._version += 1
 
-        print("\n".join(tikz))
+    def _edge_added(self, u, v):
+        self._version += 1
+        if self._pred is not None:
+            self._pred.setdefault(v, {})[u] = None
+
+    def _edge_removed(self, u, v):
+        self._version += 1
+        if self._pred is not None:
+            self._pred[v].pop(u, None)
+
+    def enable_reverse_index(self):
+        # Predecessor lookups in O(in-degree) for the price of one more entry per edge
+        pred = {}
+        for u, v in self.iter_edges():
+            pred.setdefault(v, {})[u] = None
+        self._pred = pred
+
+    def disable_reverse_index(self):
+        self._pred = None
+
+    def reverse_index_enabled(self):
+        return self._pred is not None
+
+    def get_predecessors(self, v):
+        # Without the reverse index every edge is looked at, the backends scan cheaper where they can
+        if self._pred is not None:
+            return list(self._pred.get(v, ()))
+        return [u for u, w in self.iter_edges() if w == v]
+
+    def in_degree(self, v):
+        return self.calculate_in_degrees().get(v, 0)
+
+    def snapshot(self):
+        # Read-only, point-in-time view sharing storage with the live graph. Only the
+        # row list itself is copied (O(V) references); rows are copied later, one by
+        # one, the first time the live graph writes to them. Take it between writes,
+        # e.g. from the writer thread, and hand it to readers.
+        view = copy(self)
+        for name in self.COUNTED_METHODS + self.TIMED_METHODS + ("stats",):
+            view.__dict__.pop(name, None)
+        view._cache = view._neighbor_cache = None
+        view._row_epoch = None
+        view._is_snapshot = True
+        # The live graph keeps updating its reverse index, the view scans instead
+        view._pred = None
+        self._snapshot_into(view)
+        view.add_edge = view.remove_edge = view.add_edges = _read_only
+        return view
+
+    def _snapshot_into(self, view):
+        raise NotImplementedError
+
+    def _start_epoch(self, num_rows):
+        self._epoch += 1
+        if self._row_epoch is None:
+            self._row_epoch = [0] * num_rows
+
+    def _owned(self, rows, u):
+        # The row u for writing, copied first if a snapshot may still share it
+        row_epoch = self._row_epoch
+        if row_epoch is not None and row_epoch[u] != self._epoch:
+            rows[u] = copy(rows[u])
+            row_epoch[u] = self._epoch
+        return rows[u]
+
+    def _stamp(self):
+        # The version the caches are checked against
+        return self._version
+
+    def _cached(self, key, compute):
+        if self._cache is None:
+            self._cache = ResultCache(self.CACHE_SIZE)
+        return self._cache.get(self._stamp(), key, compute)
+
+    def _cached_neighbors(self, u, scan):
+        # For backends where listing a row costs far more than looking it up. scan returns
+        # a tuple, which is handed out as is: a hit allocates nothing and callers cannot change it.
+        if self._neighbor_cache is None:
+            self._neighbor_cache = ResultCache(self.NEIGHBOR_CACHE_ENTRIES, lambda row: len(row) + 1)
+        return self._neighbor_cache.get(self._stamp(), u, lambda: scan(u))
+
+    def cache_info(self):
+        return {name: cache.info() if cache is not None else None
+                for name, cache in (("results", self._cache), ("neighbors", self._neighbor_cache))}
+
+    def freeze(self):
+        # The CSR copy is immutable, so the cached one is handed out as is
+        return self._cached("freeze", self._freeze)
+
+    def _freeze(self):
+        # CSR nodes are the labels themselves, so they have to be non-negative ints
+        if hasattr(self, 'n'):
+            num_nodes = self.n
+        else:
+            nodes = self.get_all_nodes()
+            if not all(type(node) is int and node >= 0 for node in nodes):
+                raise ValueError(f"{type(self).__name__}.freeze() needs nodes numbered 0..n-1, "
+                                 "use GraphAdjTable for other labels")
+            num_nodes = max(nodes) + 1 if nodes else 0
+        return GraphCSR.from_edges(self.iter_edges(), num_nodes)
+
+    def _label_map(self):
+        # (label -> CSR id, CSR id -> label) when freeze() numbers the nodes itself,
+        # None when the labels are the CSR node numbers
+        return None
     
-    def BFS(self, start):
+
+    def export(self, out=None, fmt="tikz"):
+        # Streams the graph to out (stdout by default), see graph_io.EXPORT_FORMATS
+        from graph_io import EXPORT_FORMATS, export_graph
+        if out is None:
+            if fmt in EXPORT_FORMATS:
+                print(f"Eksportuję graf do {EXPORT_FORMATS[fmt][0]}:\n")
+            out = sys.stdout
+        export_graph(self, out, fmt)
+
+    def save(self, path):
+        # Binary CSR file, open it again with GraphCSR.load(path)
+        from graph_io import save_graph
+        save_graph(self, path)
+    
+    def iter_bfs(self, *starts, details=False, reverse=False):
+        # Multi-source BFS: every start node sits at depth 0. With details=True
+        # yields (node, depth, parent) tuples, parent is None for the start nodes.
+        # reverse=True follows edges backwards, reaching the ancestors of the starts.
+        get_neighbors = self.get_predecessors if reverse else self.get_neighbors
         visited = set()
-        queue = [start]
+        queue = deque()
+        for start in starts:
+            if start not in visited:
+                visited.add(start)
+                queue.append((start, 0, None))
+
         while queue:
-            node = queue.pop(0)
-            if node not in visited:
-                visited.add(node)
-                print(node, end=' ')
-                for neighbor in self.get_neighbors(node):
+            node, depth, parent = queue.popleft()
+            yield (node, depth, parent) if details else node
+            for neighbor in get_neighbors(node):
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    queue.append((neighbor, depth + 1, node))
+
+    def iter_dfs(self, *starts, details=False, reverse=False):
+        # Preorder DFS from each start node in turn, skipping nodes already reached.
+        # Keeps an explicit stack of neighbor iterators, so deep graphs do not recurse.
+        get_neighbors = self.get_predecessors if reverse else self.get_neighbors
+        visited = set()
+        for start in starts:
+            if start in visited:
+                continue
+            visited.add(start)
+            yield (start, 0, None) if details else start
+            stack = [(start, iter(get_neighbors(start)))]
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
                     if neighbor not in visited:
-                        queue.append(neighbor)
+                        visited.add(neighbor)
+                        yield (neighbor, len(stack), node) if details else neighbor
+                        stack.append((neighbor, iter(get_neighbors(neighbor))))
+                        break
+                else:
+                    stack.pop()
+
+    def ancestors(self, node):
+        # Every node with a path to node, nearest first: what is affected when node changes
+        found = self.iter_bfs(node, reverse=True)
+        next(found)
+        return list(found)
+
+    def bfs_levels(self, *starts):
+        # Frontier-at-a-time versions live on GraphCSR, other backends freeze first
+        label_map = self._label_map()
+        if label_map is None:
+            return self.freeze().bfs_levels(*starts)
+        ids, labels = label_map
+        levels = self.freeze().bfs_levels(*(ids[start] for start in starts))
+        return [[labels[node] for node in level] for level in levels]
+
+    def topological_layers(self):
+        label_map = self._label_map()
+        if label_map is None:
+            return self.freeze().topological_layers()
+        labels = label_map[1]
+        return [[labels[node] for node in layer] for layer in self.freeze().topological_layers()]
+
+    def reachability_index(self, closure_limit=None):
+        # Index for many "does u reach v?" queries, see ReachabilityIndex
+        return ReachabilityIndex(self, closure_limit)
+
+    def BFS(self, start):
+        for node in self.iter_bfs(start):
+            print(node, end=' ')
         print()
         
     def DFS(self, start):
-        visited = set()
-        stack = [start]
-        while stack:
-            node = stack.pop()
-            if node not in visited:
-                visited.add(node)
-                print(node, end=' ')
-                for neighbor in self.get_neighbors(node):
-                    if neighbor not in visited:
-                        stack.append(neighbor)
+        for node in self.iter_dfs(start):
+            print(node, end=' ')
         print()
         
-    def Kahn(self):
-        # Step 1: Calculate in-degrees of all nodes
-        in_degree = self.calculate_in_degrees()
+    def topological_sort(self, lexicographic=False):
+        return list(self._cached(("topological_sort", lexicographic), lambda: self._topological_sort(lexicographic)))
 
-        # Step 2: Collect all nodes with in-degree 0
-        queue = [node for node in in_degree if in_degree[node] == 0]
-        topological_order = []
+    def _topological_sort(self, lexicographic):
+        # Kahn's algorithm in O(V+E) on top of the in-degrees the backend keeps up
+        # to date. With lexicographic=True a heap picks the smallest ready node.
+        in_degree = self._in_degree_counts()
+        get_neighbors = self.get_neighbors
+        order = [node for node in self.get_all_nodes() if in_degree[node] == 0]
 
-        # Step 3: Process nodes with in-degree 0
-        while queue:
-            node = queue.pop(0)
-            topological_order.append(node)
+        if lexicographic:
+            heap = order
+            heapify(heap)
+            order = []
+            while heap:
+                node = heappop(heap)
+                order.append(node)
+                for neighbor in get_neighbors(node):
+                    in_degree[neighbor] -= 1
+                    if in_degree[neighbor] == 0:
+                        heappush(heap, neighbor)
+        else:
+            # The result list doubles as the queue, i points at the next node to process
+            i = 0
+            while i < len(order):
+                for neighbor in get_neighbors(order[i]):
+                    in_degree[neighbor] -= 1
+                    if in_degree[neighbor] == 0:
+                        order.append(neighbor)
+                i += 1
 
-            for neighbor in self.get_neighbors(node):
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    queue.append(neighbor)
+        if len(order) != len(in_degree):
+            raise GraphCycleError()
+        return order
 
-        # Step 4: Check for cycles
-        if len(topological_order) != len(in_degree):
-            print("Graph has a cycle. Topological sorting is not possible.")
-        else:
-            print("Topological Order:", topological_order)
+    def Kahn(self):
+        try:
+            print("Topological Order:", self.topological_sort())
+        except GraphCycleError as e:
+            print(e)
             
+    def topological_sort_dfs(self):
+        return list(self._cached("topological_sort_dfs", self._topological_sort_dfs))
+
+    def _topological_sort_dfs(self):
+        # Tarjan's DFS sort with an explicit stack instead of recursion. A node is on
+        # the current path (temporary mark) or finished (permanent mark); the reversed
+        # finishing order is the result. Roots are taken in get_all_nodes() order.
+        get_neighbors = self.get_neighbors
+        on_path, done = 1, 2
+        mark = {}
+        finished = []
+        for root in self.get_all_nodes():
+            if root in mark:
+                continue
+            mark[root] = on_path
+            stack = [(root, iter(get_neighbors(root)))]
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    state = mark.get(neighbor)
+                    if state is None:
+                        mark[neighbor] = on_path
+                        stack.append((neighbor, iter(get_neighbors(neighbor))))
+                        break
+                    if state == on_path:
+                        raise GraphCycleError(
+                            f"Graph has a cycle (back edge {node} -> {neighbor}). Topological sorting is not possible.",
+                            edge=(node, neighbor),
+                        )
+                else:
+                    stack.pop()
+                    mark[node] = done
+                    finished.append(node)
+        finished.reverse()
+        return finished
+
     def Tarjan(self):
-        # Step 1: Initialize variables
-        nodes = set()  # Collect all nodes in the graph
-        for u in self.get_all_nodes():
-            nodes.add(u)
-            for v in self.get_neighbors(u):
-                nodes.add(v)
-
-        unmarked = nodes  # Nodes that are unmarked
-        temporary = set()  # Nodes with a temporary mark
-        permanent = set()  # Nodes with a permanent mark
-        topological_order = []  # Result list
-        cycle_found = [False]  # Use a list to allow modification in nested scope
-
-        def visit(node):
-            if node in permanent:
-                return  # Node is already permanently marked
-            if node in temporary:
-                print("Graph has a cycle. Topological sorting is not possible.")
-                cycle_found[0] = True
-                return  # Cycle detected
-
-            # Mark the node temporarily
-            temporary.add(node)
-
-            # Visit all neighbors
-            for neighbor in self.get_neighbors(node):
-                if not cycle_found[0]:
-                    visit(neighbor)
-
-            # Mark the node permanently and add to the result
-            temporary.remove(node)
-            permanent.add(node)
-            topological_order.append(node)
-
-        # Step 2: Visit all nodes
-        while unmarked and not cycle_found[0]:
-            node = unmarked.pop()
-            visit(node)
-
-        # Step 3: Print the result only if no cycle was found
-        if not cycle_found[0]:
-            print("Topological Order:", topological_order[::-1])  # Reverse the order
+        try:
+            print("Topological Order:", self.topological_sort_dfs())
+        except GraphCycleError as e:
+            print(e)
         
     
 #   Matrix Subclass
 
 class GraphMatrix(Graph):
-    def __init__(self, num_nodes):
+    # With use_numpy=True the matrix is an n x n uint8 NumPy array and neighbor scans,
+    # edge extraction and batch add_edges/has_edges become single array operations
+    def __init__(self, num_nodes, use_numpy=False):
         self.n = num_nodes
-        self.matrix = [[0] * self.n for _ in range(self.n)]
+        self.use_numpy = use_numpy
+        if use_numpy:
+            if np is None:
+                raise ImportError("GraphMatrix(use_numpy=True) needs NumPy installed")
+            self.matrix = np.zeros((self.n, self.n), dtype=np.uint8)
+            self._in_degree = np.zeros(self.n, dtype=np.int64)
+        else:
+            self.matrix = [[0] * self.n for _ in range(self.n)]
+            self._in_degree = [0] * self.n
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False, use_numpy=False):
+        # The matrix cannot hold duplicate edges, so dedupe is always on
+        if num_nodes is None or use_numpy:
+            sources, targets = _edge_arrays(edges)
+            if num_nodes is None:
+                num_nodes = _count_nodes(sources, targets)
+            if use_numpy:
+                return cls.from_arrays(sources, targets, num_nodes, use_numpy=True)
+            edges = zip(sources, targets)
+        graph = cls(num_nodes)
+        matrix, in_degree = graph.matrix, graph._in_degree
+        for u, v in edges:
+            row = matrix[u]
+            if row[v] != 1:
+                row[v] = 1
+                in_degree[v] += 1
+        return graph
+
+    @classmethod
+    def from_arrays(cls, sources, targets, num_nodes=None, dedupe=False, use_numpy=False):
+        if not use_numpy:
+            return cls.from_edges(zip(sources, targets), num_nodes)
+        if num_nodes is None:
+            num_nodes = _count_nodes(sources, targets)
+        graph = cls(num_nodes, use_numpy=True)
+        graph._add_edge_arrays(np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64))
+        return graph
+
+    def _add_edge_arrays(self, sources, targets):
+        if len(sources) and (min(sources.min(), targets.min()) < 0 or max(sources.max(), targets.max()) >= self.n):
+            raise IndexError("edge endpoint out of range")
+        # Work on flat cell indices, so duplicates and already present edges are dropped at once
+        cells = self.matrix.reshape(-1)
+        flat = np.unique(sources * self.n + targets)
+        new = flat[cells[flat] == 0]
+        if new.size:
+            cells[new] = 1
+            self._in_degree += np.bincount(new % self.n, minlength=self.n)
+            self._changed()
+            if self._pred is not None:
+                for cell in new.tolist():
+                    self._pred.setdefault(cell % self.n, {})[cell // self.n] = None
 
     def add_edge(self, u, v):
-        self.matrix[u][v] = 1
+        if self.matrix[u][v] != 1:
+            self._owned(self.matrix, u)[v] = 1
+            self._in_degree[v] += 1
+            self._edge_added(u, v)
+
+    def remove_edge(self, u, v):
+        if self.matrix[u][v] != 1:
+            return False
+        self._owned(self.matrix, u)[v] = 0
+        self._in_degree[v] -= 1
+        self._edge_removed(u, v)
+        return True
+
+    def add_edges(self, l):
+        if not self.use_numpy:
+            return super().add_edges(l)
+        pairs = np.array(list(l), dtype=np.int64).reshape(-1, 2)
+        self._add_edge_arrays(pairs[:, 0], pairs[:, 1])
 
     def has_edge(self, u, v):
-        return self.matrix[u][v] == 1
+        return bool(self.matrix[u][v] == 1)
+
+    def _snapshot_into(self, view):
+        if self.use_numpy:
+            # NumPy rows cannot be swapped out one by one, the matrix is copied in one memcpy
+            view.matrix = self.matrix.copy()
+            view._in_degree = self._in_degree.copy()
+            return
+        view.matrix = self.matrix[:]
+        view._in_degree = self._in_degree[:]
+        self._start_epoch(self.n)
+
+    def get_predecessors(self, v):
+        if self._pred is not None:
+            return super().get_predecessors(v)
+        # Column scan
+        if self.use_numpy:
+            return np.flatnonzero(self.matrix[:, v]).tolist()
+        return [u for u in range(self.n) if self.matrix[u][v] == 1]
+
+    def in_degree(self, v):
+        return int(self._in_degree[v])
+
+    def has_edges(self, pairs):
+        # One answer per (u, v) pair; a NumPy bool array in NumPy mode
+        if not self.use_numpy:
+            return [self.matrix[u][v] == 1 for u, v in pairs]
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        return self.matrix[pairs[:, 0], pairs[:, 1]] == 1
 
     def display(self):
         for row in self.matrix:
-            print(row)
+            print(row.tolist() if self.use_numpy else row)
             
     def get_neighbors(self, u):
-        neighbors = []
-        for v in range(self.n):
-            if self.has_edge(u, v):
-                neighbors.append(v)
-        return neighbors
+        return self._cached_neighbors(u, self._scan_row)
+
+    def _scan_row(self, u):
+        if self.use_numpy:
+            return tuple(np.flatnonzero(self.matrix[u]).tolist())
+        return tuple(compress(range(self.n), self.matrix[u]))
     
     def calculate_in_degrees(self):
-        in_degree = {node: 0 for node in range(self.n)}
-        for u in range(self.n):
-            for v in range(self.n):
-                if self.matrix[u][v] == 1:
-                    in_degree[v] += 1
-        return in_degree
+        return dict(enumerate(self._in_degree_counts()))
+
+    def _in_degree_counts(self):
+        if self.use_numpy:
+            return self._in_degree.tolist()
+        return self._in_degree[:]
     
     def get_all_nodes(self):
         return range(self.n)
-        
+
+    def iter_edges(self):
+        if self.use_numpy:
+            sources, targets = np.nonzero(self.matrix)
+            yield from zip(sources.tolist(), targets.tolist())
+            return
+        for u, row in enumerate(self.matrix):
+            for v in range(self.n):
+                if row[v] == 1:
+                    yield u, v
+
+    def _freeze(self):
+        if not self.use_numpy:
+            return super()._freeze()
+        # np.nonzero walks the matrix row by row, so targets come out already in CSR order
+        offsets = np.zeros(self.n + 1, dtype=np.int32)
+        np.cumsum(np.count_nonzero(self.matrix, axis=1), out=offsets[1:])
+        targets = np.nonzero(self.matrix)[1].astype(np.int32)
+        return GraphCSR(array('i', offsets.tobytes()), array('i', targets.tobytes()))
+
+
+#   Bit Matrix Subclass
+
+class GraphBitMatrix(Graph):
+    # Same interface as GraphMatrix, but every row is packed into a single
+    # Python int (bit v of row u is set when the edge u -> v exists)
+    def __init__(self, num_nodes):
+        self.n = num_nodes
+        self.rows = [0] * self.n
+        self._in_degree = [0] * self.n
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False):
+        # Bits are set in a bytearray per row and turned into an int once at the end,
+        # instead of reallocating the row int on every edge. Always deduped.
+        if num_nodes is None:
+            sources, targets = _edge_arrays(edges)
+            num_nodes = _count_nodes(sources, targets)
+            edges = zip(sources, targets)
+        graph = cls(num_nodes)
+        in_degree = graph._in_degree
+        row_size = (num_nodes + 7) // 8
+        buffers = {}
+        for u, v in edges:
+            buffer = buffers.get(u)
+            if buffer is None:
+                buffer = buffers[u] = bytearray(row_size)
+            mask = 1 << (v & 7)
+            if not buffer[v >> 3] & mask:
+                buffer[v >> 3] |= mask
+                in_degree[v] += 1
+        for u, buffer in buffers.items():
+            graph.rows[u] = int.from_bytes(buffer, 'little')
+        return graph
+
+    def _column(self, v):
+        # A row int has no fixed width, so out-of-range columns are caught here, like a list index would be
+        if not 0 <= v < self.n:
+            raise IndexError(f"node {v} is out of range")
+        return 1 << v
+
+    def add_edge(self, u, v):
+        bit = self._column(v)
+        if not self.rows[u] & bit:
+            self.rows[u] |= bit
+            self._in_degree[v] += 1
+            self._edge_added(u, v)
+
+    def remove_edge(self, u, v):
+        bit = self._column(v)
+        if not self.rows[u] & bit:
+            return False
+        self.rows[u] ^= bit
+        self._in_degree[v] -= 1
+        self._edge_removed(u, v)
+        return True
+
+    def has_edge(self, u, v):
+        return self.rows[u] & self._column(v) != 0
+
+    def get_predecessors(self, v):
+        if self._pred is not None:
+            return super().get_predecessors(v)
+        bit = 1 << v
+        return [u for u, row in enumerate(self.rows) if row & bit]
+
+    def in_degree(self, v):
+        return self._in_degree[v]
+
+    def _snapshot_into(self, view):
+        # Rows are immutable ints, every write already puts a new one in place
+        view.rows = self.rows[:]
+        view._in_degree = self._in_degree[:]
+
+    def display(self):
+        for row in self.rows:
+            print([(row >> v) & 1 for v in range(self.n)])
+
+    def get_neighbors(self, u):
+        # Jump straight from one set bit to the next instead of testing all n columns
+        neighbors = []
+        row = self.rows[u]
+        v = 0
+        while row:
+            skip = (row & -row).bit_length() - 1
+            v += skip
+            neighbors.append(v)
+            row >>= skip + 1
+            v += 1
+        return neighbors
+
+    def calculate_in_degrees(self):
+        return dict(enumerate(self._in_degree))
+
+    def _in_degree_counts(self):
+        return self._in_degree[:]
+
+    def get_all_nodes(self):
+        return range(self.n)
+
+    def iter_edges(self):
+        for u in range(self.n):
+            for v in self.get_neighbors(u):
+                yield u, v
+
 
 #   Edge List Subclass
 
 class GraphEdgeList(Graph):
-    def __init__(self):
+    # A snapshot() shares the edge list and reads only its first _limit edges, the
+    # live graph only appends past them. The rows of _out and the edge set are
+    # copied by the live graph the first time it writes to them after a snapshot.
+    _limit = None
+    _set_epoch = 0
+    _list_epoch = 0
+
+    def __init__(self, num_nodes=0):
         self.edges = []
+        self._num_nodes = num_nodes
+        # Index over self.edges: successors per node, edge membership and the
+        # in-degree of every node (its keys are the nodes in first-seen order,
+        # after 0..num_nodes-1 which are known up front even without any edges).
+        # It is only caught up with the edges appended since the last query,
+        # so self.edges stays the canonical ordered storage.
+        self._out = {}
+        self._edge_set = set()
+        self._in_degree = dict.fromkeys(range(num_nodes), 0)
+        self._indexed = 0
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False):
+        # The list is taken over as is, the index is built on the first query
+        graph = cls(num_nodes or 0)
+        if dedupe:
+            graph.edges = list(dict.fromkeys((u, v) for u, v in edges))
+        else:
+            graph.edges = [(u, v) for u, v in edges]
+        return graph
+
+    def _sync(self):
+        edges = self.edges
+        # Snapshots are indexed when taken and never catch up with the shared list
+        if self._indexed == len(edges) or self._limit is not None:
+            return
+        if self._indexed > len(edges):
+            # Edges were removed behind our back, start over
+            self._out, self._edge_set, self._indexed = {}, set(), 0
+            self._in_degree = dict.fromkeys(range(self._num_nodes), 0)
+            if self._pred is not None:
+                self._pred = {}
+        out, in_degree, pred = self._out, self._in_degree, self._pred
+        edge_set = self._owned_edge_set()
+        row_epoch, epoch = self._row_epoch, self._epoch
+        for i in range(self._indexed, len(edges)):
+            u, v = edge = edges[i]
+            edge_set.add(edge)
+            if pred is not None:
+                pred.setdefault(v, {})[u] = None
+            if u not in in_degree:
+                in_degree[u] = 0
+            in_degree[v] = in_degree.get(v, 0) + 1
+            if u in out:
+                if row_epoch is not None and row_epoch.get(u) != epoch:
+                    out[u] = out[u][:]
+                    row_epoch[u] = epoch
+                out[u].append(v)
+            else:
+                out[u] = [v]
+                if row_epoch is not None:
+                    row_epoch[u] = epoch
+        self._indexed = len(edges)
+
+    def _owned_edge_set(self):
+        if self._row_epoch is not None and self._set_epoch != self._epoch:
+            self._edge_set = self._edge_set.copy()
+            self._set_epoch = self._epoch
+        return self._edge_set
+
+    def _owned_row(self, u):
+        # Rows are keyed by label here, so _row_epoch is a dict instead of a list
+        row_epoch = self._row_epoch
+        if row_epoch is not None and row_epoch.get(u) != self._epoch:
+            self._out[u] = self._out[u][:]
+            row_epoch[u] = self._epoch
+        return self._out[u]
 
     def add_edge(self, u, v):
-        self.edges.append((u, v))
+        self._sync()
+        if (u, v) not in self._edge_set:
+            self.edges.append((u, v))
+
+    def remove_edge(self, u, v):
+        # The list is the canonical storage, so this is a linear scan of it
+        self._sync()
+        if (u, v) not in self._edge_set:
+            return False
+        if self._row_epoch is not None and self._list_epoch != self._epoch:
+            # Removing shifts the edges a snapshot still reads, so it gets its own list
+            self.edges = self.edges[:]
+            self._list_epoch = self._epoch
+        self.edges.remove((u, v))
+        out = self._owned_row(u)
+        out.remove(v)
+        self._in_degree[v] -= 1
+        self._indexed -= 1
+        if v in out:
+            # from_edges() may have kept duplicates, the edge is still there
+            self._changed()
+        else:
+            self._owned_edge_set().discard((u, v))
+            self._edge_removed(u, v)
+        return True
+
+    def enable_reverse_index(self):
+        # Built from the index, _sync() adds the edges appended later
+        self._sync()
+        super().enable_reverse_index()
+
+    def get_predecessors(self, v):
+        self._sync()
+        return super().get_predecessors(v)
+
+    def in_degree(self, v):
+        self._sync()
+        return self._in_degree.get(v, 0)
+
+    def _snapshot_into(self, view):
+        # The index is caught up here, on the writer thread, so readers of the view
+        # never build one. The view shares the edge list up to its current length,
+        # the edge set and the rows; only the row dict and in-degrees are copied.
+        self._sync()
+        view._limit = view._indexed = self._indexed
+        view._out = self._out.copy()
+        view._in_degree = self._in_degree.copy()
+        self._epoch += 1
+        if self._row_epoch is None:
+            self._row_epoch = {}
+
+    def _stamp(self):
+        # Edges may also be appended to self.edges directly, the length catches that
+        if self._limit is not None:
+            return self._version, self._limit
+        return self._version, len(self.edges)
 
     def has_edge(self, u, v):
-        return (u, v) in self.edges
+        self._sync()
+        return (u, v) in self._edge_set
 
     def display(self):
-        for u, v in self.edges:
+        for u, v in self.iter_edges():
             print(f"{u} -> {v}")
             
     def get_neighbors(self, u):
-        neighbors = []
-        for edge in self.edges:
-            if edge[0] == u:
-                neighbors.append(edge[1])
-        return neighbors
+        self._sync()
+        if self._is_snapshot:
+            return tuple(self._out.get(u, ()))
+        return self._out.get(u, [])
     
     def calculate_in_degrees(self):
-        nodes = {u for u, v in self.edges}.union({v for u, v in self.edges})
-        in_degree = {node: 0 for node in nodes}
-        for u, v in self.edges:
-            in_degree[v] += 1
-        return in_degree
+        self._sync()
+        return self._in_degree.copy()
     
     def get_all_nodes(self):
-        nodes = set()
-        for u, v in self.edges:
-            nodes.add(u)
-            nodes.add(v)
-        return nodes
+        self._sync()
+        return self._in_degree.keys()
+
+    def iter_edges(self):
+        if self._limit is not None:
+            return islice(self.edges, self._limit)
+        return iter(self.edges)
 
 #   Adjacency Table Subclass
 
+class NodeRegistry:
+    # Interns node labels (any hashable) to dense ids 0..n-1 in first-seen order.
+    # identity stays True while every label is the int equal to its own id, which
+    # lets GraphAdjTable skip translating ids back to labels.
+    __slots__ = ("ids", "labels", "identity")
+
+    def __init__(self, num_nodes=0):
+        self.ids = {node: node for node in range(num_nodes)}
+        self.labels = list(range(num_nodes))
+        self.identity = True
+
+    def intern(self, label):
+        node_id = self.ids.get(label)
+        if node_id is None:
+            node_id = self.ids[label] = len(self.labels)
+            self.labels.append(label)
+            if self.identity and not (type(label) is int and label == node_id):
+                self.identity = False
+        return node_id
+
+    def get(self, label):
+        return self.ids.get(label)
+
+    def copy(self):
+        registry = NodeRegistry()
+        registry.ids = self.ids.copy()
+        registry.labels = self.labels[:]
+        registry.identity = self.identity
+        return registry
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.ids
+
+    def __iter__(self):
+        return iter(self.labels)
+
+
 class GraphAdjTable(Graph):
-    def __init__(self):
-        self.adj = {}
+    # Labels are interned by a NodeRegistry; storage works on the dense ids only.
+    # The successors of a node are a sorted array('i') of ids while its out-degree is
+    # at most HUB_DEGREE (bisect lookups, compact) and a set once it grows past that
+    # (O(1) lookups and removals on hubs); it turns back into an array when it shrinks
+    # below half of that. Edges are deduplicated on insert. The public methods take
+    # and return the original labels.
+    HUB_DEGREE = 64
+
+    def __init__(self, num_nodes=0):
+        # Nodes 0..num_nodes-1 are known up front, even without any edges
+        self.nodes = NodeRegistry(num_nodes)
+        self._out = [array('i') for _ in range(num_nodes)]
+        self._in_degree = array('i', bytes(array('i').itemsize * num_nodes))
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False):
+        # Rows are filled unsorted and sorted, deduplicated and counted once at the
+        # end, so dedupe is always on
+        graph = cls(num_nodes or 0)
+        node, out = graph._node, graph._out
+        for u, v in edges:
+            out[node(u)].append(node(v))
+        in_degree = graph._in_degree
+        for u, row in enumerate(out):
+            if len(row) > 1:
+                unique = sorted(set(row))
+                out[u] = set(unique) if len(unique) > cls.HUB_DEGREE else array('i', unique)
+            for v in out[u]:
+                in_degree[v] += 1
+        return graph
+
+    def _node(self, label):
+        node_id = self.nodes.intern(label)
+        if node_id == len(self._out):
+            self._out.append(array('i'))
+            self._in_degree.append(0)
+            if self._row_epoch is not None:
+                self._row_epoch.append(self._epoch)
+        return node_id
+
+    def _snapshot_into(self, view):
+        view.nodes = self.nodes.copy()
+        view._out = self._out[:]
+        view._in_degree = array('i', self._in_degree)
+        self._start_epoch(len(self._out))
 
     def add_edge(self, u, v):
-        if u not in self.adj:
-            self.adj[u] = []
-        self.adj[u].append(v)
+        u_id = self._node(u)
+        v_id = self._node(v)
+        row = self._out[u_id]
+        if type(row) is set:
+            if v_id in row:
+                return
+            self._owned(self._out, u_id).add(v_id)
+        else:
+            i = bisect_left(row, v_id)
+            if i < len(row) and row[i] == v_id:
+                return
+            if len(row) < self.HUB_DEGREE:
+                self._owned(self._out, u_id).insert(i, v_id)
+            else:
+                self._out[u_id] = set(row)
+                self._out[u_id].add(v_id)
+        self._in_degree[v_id] += 1
+        self._edge_added(u, v)
+
+    def remove_edge(self, u, v):
+        u_id, v_id = self.nodes.get(u), self.nodes.get(v)
+        if u_id is None or v_id is None:
+            return False
+        row = self._out[u_id]
+        if type(row) is set:
+            if v_id not in row:
+                return False
+            row = self._owned(self._out, u_id)
+            row.remove(v_id)
+            if len(row) < self.HUB_DEGREE // 2:
+                self._out[u_id] = array('i', sorted(row))
+        else:
+            i = bisect_left(row, v_id)
+            if i == len(row) or row[i] != v_id:
+                return False
+            del self._owned(self._out, u_id)[i]
+        self._in_degree[v_id] -= 1
+        self._edge_removed(u, v)
+        return True
 
     def has_edge(self, u, v):
-        return u in self.adj and v in self.adj[u]
+        u_id, v_id = self.nodes.get(u), self.nodes.get(v)
+        if u_id is None or v_id is None:
+            return False
+        row = self._out[u_id]
+        if type(row) is set:
+            return v_id in row
+        i = bisect_left(row, v_id)
+        return i < len(row) and row[i] == v_id
+
+    @property
+    def adj(self):
+        # Read-only {label: [labels]} view of the nodes with outgoing edges, built on each access
+        labels = self.nodes.labels
+        return {labels[u]: [labels[v] for v in sorted(row)] for u, row in enumerate(self._out) if row}
 
     def display(self):
-        for u in self.adj:
-            print(f"{u}: {self.adj[u]}")
+        for u, neighbors in self.adj.items():
+            print(f"{u}: {neighbors}")
             
     def get_neighbors(self, u):
-        return self.adj.get(u, [])
+        u_id = self.nodes.get(u)
+        if u_id is None:
+            return []
+        if self.nodes.identity:
+            return tuple(self._out[u_id]) if self._is_snapshot else self._out[u_id]
+        labels = self.nodes.labels
+        return [labels[v] for v in self._out[u_id]]
     
     def calculate_in_degrees(self):
-        # Ensure all nodes are included, even those without outgoing edges
-        in_degree = {node: 0 for node in self.get_all_nodes()}
-        for u in self.adj:
-            for v in self.adj[u]:
-                in_degree[v] += 1
-        return in_degree
+        return dict(zip(self.nodes.labels, self._in_degree))
+
+    def in_degree(self, v):
+        v_id = self.nodes.get(v)
+        return 0 if v_id is None else self._in_degree[v_id]
+
+    def _in_degree_counts(self):
+        if self.nodes.identity:
+            return self._in_degree.tolist()
+        return self.calculate_in_degrees()
 
     def get_all_nodes(self):
         # Include all nodes, even those without outgoing edges
-        nodes = set(self.adj.keys())
-        for neighbors in self.adj.values():
-            nodes.update(neighbors)
-        return nodes
+        return self.nodes
+
+    def iter_edges(self):
+        labels = self.nodes.labels
+        identity = self.nodes.identity
+        for u, row in enumerate(self._out):
+            if identity:
+                for v in row:
+                    yield u, v
+            else:
+                for v in row:
+                    yield labels[u], labels[v]
+
+    def _label_map(self):
+        # Non-negative int labels stay CSR node numbers, as in adj_table_to_matrix;
+        # any other labels are frozen under their dense ids
+        nodes = self.nodes
+        if nodes.identity or all(type(node) is int and node >= 0 for node in nodes):
+            return None
+        return nodes.ids, nodes.labels
+
+    def _freeze(self):
+        if not self.nodes.identity and self._label_map() is None:
+            return super()._freeze()
+        # The rows go into the CSR arrays as they are, only hub sets need sorting
+        offsets = array('i', [0])
+        targets = array('i')
+        for row in self._out:
+            targets.extend(sorted(row) if type(row) is set else row)
+            offsets.append(len(targets))
+        return GraphCSR(offsets, targets)
+
+
+#   Compressed Sparse Row Subclass
+
+class GraphCSR(Graph):
+    # Immutable graph: the neighbors of u are targets[offsets[u]:offsets[u + 1]],
+    # kept sorted so has_edge can bisect. Build it with freeze() on any other backend.
+    def __init__(self, offsets, targets):
+        self.n = len(offsets) - 1
+        self.offsets = offsets
+        self.targets = targets
+        self._in_degree = None
+
+    @classmethod
+    def from_edges(cls, edges, num_nodes=None, dedupe=False):
+        sources, targets = _edge_arrays(edges)
+        return cls.from_arrays(sources, targets, num_nodes, dedupe)
+
+    @classmethod
+    def from_arrays(cls, sources, targets, num_nodes=None, dedupe=False):
+        if num_nodes is None:
+            num_nodes = _count_nodes(sources, targets)
+
+        # Counting sort by source node, skipped when the edges already come in row order
+        offsets = array('i', bytes(array('i').itemsize * (num_nodes + 1)))
+        ordered = True
+        last_u = last_v = -1
+        for u, v in zip(sources, targets):
+            offsets[u + 1] += 1
+            if u < last_u or (u == last_u and v < last_v):
+                ordered = False
+            last_u, last_v = u, v
+        for u in range(num_nodes):
+            offsets[u + 1] += offsets[u]
+
+        if ordered:
+            sorted_targets = array('i', targets)
+        else:
+            position = offsets[:-1]
+            sorted_targets = array('i', bytes(array('i').itemsize * len(targets)))
+            for u, v in zip(sources, targets):
+                sorted_targets[position[u]] = v
+                position[u] += 1
+            for u in range(num_nodes):
+                lo, hi = offsets[u], offsets[u + 1]
+                if hi - lo > 1:
+                    sorted_targets[lo:hi] = array('i', sorted(sorted_targets[lo:hi]))
+
+        if dedupe:
+            # Rows are sorted, so duplicates sit next to each other
+            unique = array('i')
+            unique_offsets = array('i', [0])
+            for u in range(num_nodes):
+                last = -1
+                for i in range(offsets[u], offsets[u + 1]):
+                    v = sorted_targets[i]
+                    if v != last:
+                        unique.append(v)
+                        last = v
+                unique_offsets.append(len(unique))
+            offsets, sorted_targets = unique_offsets, unique
+        return cls(offsets, sorted_targets)
+
+    @classmethod
+    def load(cls, path):
+        # Memory-maps a file written by save(), the buffers are read-only views of it
+        from graph_io import load_graph
+        return load_graph(path)
+
+    def add_edge(self, u, v):
+        raise TypeError("GraphCSR is immutable, add edges to the source graph before freeze()")
+
+    def remove_edge(self, u, v):
+        raise TypeError("GraphCSR is immutable, remove edges from the source graph before freeze()")
+
+    def has_edge(self, u, v):
+        hi = self.offsets[u + 1]
+        i = bisect_left(self.targets, v, self.offsets[u], hi)
+        return i < hi and self.targets[i] == v
+
+    def display(self):
+        for u in range(self.n):
+            print(f"{u}: {list(self.get_neighbors(u))}")
+
+    def get_neighbors(self, u):
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def calculate_in_degrees(self):
+        return dict(enumerate(self._in_degree_counts()))
+
+    def _in_degree_counts(self):
+        # Counted once on first use, the graph cannot change afterwards
+        if self._in_degree is None:
+            counts = [0] * self.n
+            for v in self.targets:
+                counts[v] += 1
+            self._in_degree = counts
+        return self._in_degree[:]
+
+    def get_predecessors(self, v):
+        # The predecessors are the rows of the transposed graph, built once on first use
+        return self._cached("reverse", self._transpose).get_neighbors(v)
+
+    def _transpose(self):
+        sources = array('i')
+        for u in range(self.n):
+            sources.extend(array('i', [u]) * (self.offsets[u + 1] - self.offsets[u]))
+        return GraphCSR.from_arrays(self.targets, sources, self.n)
+
+    def in_degree(self, v):
+        if self._in_degree is None:
+            self._in_degree_counts()
+        return self._in_degree[v]
+
+    def get_all_nodes(self):
+        return range(self.n)
+
+    def iter_edges(self):
+        targets = self.targets
+        for u in range(self.n):
+            for i in range(self.offsets[u], self.offsets[u + 1]):
+                yield u, targets[i]
+
+    def freeze(self):
+        return self
+
+    def snapshot(self):
+        return self
+
+    def _numpy_buffers(self):
+        # Zero-copy NumPy views of offsets and targets
+        return np.frombuffer(self.offsets, dtype=np.intc), np.frombuffer(self.targets, dtype=np.intc)
+
+    def bfs_levels(self, *starts):
+        # Multi-source BFS one whole frontier at a time; levels[d] lists (sorted) the nodes at depth d
+        if np is not None:
+            return self._bfs_levels_numpy(starts)
+        offsets, targets = self.offsets, self.targets
+        seen = bytearray(self.n)
+        frontier = sorted(set(starts))
+        for node in frontier:
+            seen[node] = 1
+        levels = []
+        while frontier:
+            levels.append(frontier)
+            next_frontier = []
+            for u in frontier:
+                for v in targets[offsets[u]:offsets[u + 1]]:
+                    if not seen[v]:
+                        seen[v] = 1
+                        next_frontier.append(v)
+            next_frontier.sort()
+            frontier = next_frontier
+        return levels
+
+    def topological_layers(self):
+        # Kahn's algorithm layer by layer: layer k holds the nodes whose longest path from a
+        # source has k edges, every layer is an antichain and their concatenation is a valid order
+        if np is not None:
+            return self._topological_layers_numpy()
+        offsets, targets = self.offsets, self.targets
+        in_degree = self._in_degree_counts()
+        layer = [node for node in range(self.n) if in_degree[node] == 0]
+        layers = []
+        done = 0
+        while layer:
+            layers.append(layer)
+            done += len(layer)
+            next_layer = []
+            for u in layer:
+                for v in targets[offsets[u]:offsets[u + 1]]:
+                    in_degree[v] -= 1
+                    if in_degree[v] == 0:
+                        next_layer.append(v)
+            next_layer.sort()
+            layer = next_layer
+        if done != self.n:
+            raise GraphCycleError()
+        return layers
+
+    def _gather(self, offsets, targets, frontier):
+        # Targets of all nodes in frontier in one go: every row start is repeated once per
+        # edge in the row and a running index walks through the rows
+        starts = offsets[frontier]
+        lengths = offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return targets[:0]
+        ends = np.cumsum(lengths)
+        return targets[np.repeat(starts - ends + lengths, lengths) + np.arange(total)]
+
+    def _bfs_levels_numpy(self, starts):
+        offsets, targets = self._numpy_buffers()
+        seen = np.zeros(self.n, dtype=bool)
+        frontier = np.unique(np.asarray(starts, dtype=np.intp))
+        seen[frontier] = True
+        levels = []
+        while frontier.size:
+            levels.append(frontier.tolist())
+            reached = self._gather(offsets, targets, frontier)
+            frontier = np.unique(reached[~seen[reached]])
+            seen[frontier] = True
+        return levels
+
+    def _topological_layers_numpy(self):
+        offsets, targets = self._numpy_buffers()
+        in_degree = np.bincount(targets, minlength=self.n)
+        layer = np.flatnonzero(in_degree == 0)
+        layers = []
+        done = 0
+        while layer.size:
+            layers.append(layer.tolist())
+            done += layer.size
+            touched, counts = np.unique(self._gather(offsets, targets, layer), return_counts=True)
+            in_degree[touched] -= counts
+            layer = touched[in_degree[touched] == 0]
+        if done != self.n:
+            raise GraphCycleError()
+        return layers
+
+#   Dynamic Topological Order
+
+class DynamicTopologicalOrder:
+    # Keeps a valid topological order of a graph while edges are added through it
+    # (Pearce-Kelly). Inserting u -> v with v already ahead of u only reorders the
+    # nodes whose positions lie between the two, and an edge that would close a
+    # cycle raises GraphCycleError before it reaches the graph.
+    def __init__(self, graph):
+        self.graph = graph
+        self._order = graph.topological_sort()
+        self._pos = {node: i for i, node in enumerate(self._order)}
+        self._pred = {}
+        for u, v in graph.iter_edges():
+            self._pred.setdefault(v, []).append(u)
+
+    def order(self):
+        return list(self._order)
+
+    def position(self, node):
+        return self._pos[node]
+
+    def add_node(self, node):
+        if node not in self._pos:
+            self._pos[node] = len(self._order)
+            self._order.append(node)
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        if self.graph.has_edge(u, v):
+            return
+        lower, upper = self._pos[v], self._pos[u]
+        if lower == upper:
+            raise GraphCycleError(f"Edge {u} -> {v} would create a cycle.", edge=(u, v))
+        if lower < upper:
+            # Only nodes with positions in [lower, upper] can be out of order now
+            forward = self._search(v, self.graph.get_neighbors, lambda p: p < upper, u)
+            if forward is None:
+                raise GraphCycleError(f"Edge {u} -> {v} would create a cycle.", edge=(u, v))
+            backward = self._search(u, lambda w: self._pred.get(w, ()), lambda p: p > lower, None)
+            self._reorder(backward, forward)
+        self.graph.add_edge(u, v)
+        self._pred.setdefault(v, []).append(u)
+
+    def remove_edge(self, u, v):
+        # Dropping an edge never invalidates the order, only the predecessor lists change
+        if not self.graph.remove_edge(u, v):
+            return False
+        self._pred[v].remove(u)
+        return True
+
+    def add_edges(self, l):
+        for u, v in l:
+            self.add_edge(u, v)
+
+    def _search(self, start, step, in_region, target):
+        # Iterative DFS restricted to the affected region, None if target is reached
+        pos = self._pos
+        seen = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for neighbor in step(node):
+                if neighbor == target:
+                    return None
+                if neighbor not in seen and in_region(pos[neighbor]):
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        return seen
+
+    def _reorder(self, backward, forward):
+        # Everything that reaches u goes before everything reachable from v,
+        # reusing the same set of positions and keeping the relative order inside each group
+        pos = self._pos
+        backward = sorted(backward, key=pos.__getitem__)
+        forward = sorted(forward, key=pos.__getitem__)
+        slots = sorted(pos[node] for node in backward + forward)
+        for slot, node in zip(slots, backward + forward):
+            pos[node] = slot
+            self._order[slot] = node
+
+
+#   Reachability Index
+
+class ReachabilityIndex:
+    # Answers "does u reach v?" on a DAG without a traversal per query. It is built once
+    # from a frozen copy of the graph, so edges added afterwards need a new index.
+    # Every node reaches itself.
+    #
+    # Up to closure_limit nodes the full transitive closure is kept: one int bitset per
+    # node, filled in reverse topological order, and a query is a single bit test.
+    # Bigger graphs get interval labels instead (GRAIL): two DFS passes, visiting children
+    # in opposite orders, give every node a post-order number post[u] and low[u], the
+    # smallest post number of anything u reaches. u reaching v implies low[u] <= low[v]
+    # and post[v] <= post[u] in both passes, which settles most negative queries together
+    # with the topological ranks. v inside u's subtree of the first DFS forest is a yes.
+    # Whatever is left runs a DFS pruned by the same labels.
+    CLOSURE_LIMIT = 10000
+
+    def __init__(self, graph, closure_limit=None):
+        csr = graph.freeze()
+        # Queries take the graph's labels, translated to CSR ids when those differ
+        label_map = graph._label_map()
+        self._ids = label_map[0] if label_map is not None else None
+        self.n = csr.n
+        self._offsets, self._targets = csr.offsets, csr.targets
+        order = csr.topological_sort()
+        if closure_limit is None:
+            closure_limit = self.CLOSURE_LIMIT
+        self._closure = None
+        if self.n <= closure_limit:
+            self._build_closure(order)
+        else:
+            in_degree = csr._in_degree_counts()
+            self._build_labels(order, [node for node in order if in_degree[node] == 0])
+
+    def _build_closure(self, order):
+        offsets, targets = self._offsets, self._targets
+        closure = [0] * self.n
+        for u in reversed(order):
+            bits = 1 << u
+            for i in range(offsets[u], offsets[u + 1]):
+                bits |= closure[targets[i]]
+            closure[u] = bits
+        self._closure = closure
+
+    def _build_labels(self, order, roots):
+        offsets, targets = self._offsets, self._targets
+        zeros = bytes(array('i').itemsize * self.n)
+        self._rank = array('i', zeros)
+        for i, node in enumerate(order):
+            self._rank[node] = i
+
+        self._labels = []
+        for step in (1, -1):
+            post = array('i', zeros)
+            entry = array('i', zeros)
+            visited = bytearray(self.n)
+            counter = 0
+            for root in roots[::step]:
+                visited[root] = 1
+                entry[root] = counter
+                # Stack entries are (node, next target index, end index), walking the row in step direction
+                lo, hi = offsets[root], offsets[root + 1]
+                stack = [(root, lo, hi) if step == 1 else (root, hi - 1, lo - 1)]
+                while stack:
+                    node, i, end = stack[-1]
+                    while i != end and visited[targets[i]]:
+                        i += step
+                    if i == end:
+                        stack.pop()
+                        post[node] = counter
+                        counter += 1
+                        continue
+                    stack[-1] = (node, i + step, end)
+                    child = targets[i]
+                    visited[child] = 1
+                    entry[child] = counter
+                    lo, hi = offsets[child], offsets[child + 1]
+                    stack.append((child, lo, hi) if step == 1 else (child, hi - 1, lo - 1))
+
+            # Children come later in topological order, so their low is final by the time u is reached
+            low = array('i', post)
+            for u in reversed(order):
+                smallest = low[u]
+                for i in range(offsets[u], offsets[u + 1]):
+                    if low[targets[i]] < smallest:
+                        smallest = low[targets[i]]
+                low[u] = smallest
+            self._labels.append((post, low))
+            if step == 1:
+                # Post numbers of u's DFS subtree are exactly entry[u]..post[u]
+                self._entry, self._post = entry, post
+
+    def _may_reach(self, u, v):
+        if self._rank[u] > self._rank[v]:
+            return False
+        for post, low in self._labels:
+            if post[v] > post[u] or low[v] < low[u]:
+                return False
+        return True
+
+    def _in_subtree(self, u, v):
+        return self._entry[u] <= self._post[v] <= self._post[u]
+
+    def reaches(self, u, v):
+        if self._ids is not None:
+            u, v = self._ids[u], self._ids[v]
+        return self._reaches(u, v)
+
+    def _reaches(self, u, v):
+        if self._closure is not None:
+            return (self._closure[u] >> v) & 1 == 1
+        if u == v or self._in_subtree(u, v):
+            return True
+        if not self._may_reach(u, v):
+            return False
+        # Pruned DFS: only nodes whose labels still allow reaching v are expanded
+        offsets, targets = self._offsets, self._targets
+        seen = {u}
+        stack = [u]
+        while stack:
+            node = stack.pop()
+            for i in range(offsets[node], offsets[node + 1]):
+                w = targets[i]
+                if w in seen:
+                    continue
+                if w == v or self._in_subtree(w, v):
+                    return True
+                seen.add(w)
+                if self._may_reach(w, v):
+                    stack.append(w)
+        return False
+
+    def reaches_many(self, pairs):
+        # Batch variant, one bool per (u, v) pair in the same order
+        if self._ids is not None:
+            ids = self._ids
+            pairs = [(ids[u], ids[v]) for u, v in pairs]
+        if self._closure is not None:
+            closure = self._closure
+            return [(closure[u] >> v) & 1 == 1 for u, v in pairs]
+        reaches = self._reaches
+        return [reaches(u, v) for u, v in pairs]
+
 
 def matrix_to_edge_list(matrix_graph):
-    edge_list_graph = GraphEdgeList()
-    for u in range(matrix_graph.n):
-        for v in range(matrix_graph.n):
-            if matrix_graph.matrix[u][v] == 1:
-                edge_list_graph.add_edge(u, v)
-    return edge_list_graph
+    return GraphEdgeList.from_edges(matrix_graph.iter_edges(), matrix_graph.n)
 
 def matrix_to_adj_table(matrix_graph):
-    adj_table_graph = GraphAdjTable()
-    for u in range(matrix_graph.n):
-        for v in range(matrix_graph.n):
-            if matrix_graph.matrix[u][v] == 1:
-                adj_table_graph.add_edge(u, v)
-    return adj_table_graph
+    return GraphAdjTable.from_edges(matrix_graph.iter_edges(), matrix_graph.n)
 
 def edge_list_to_matrix(edge_list_graph, num_nodes):
-    matrix_graph = GraphMatrix(num_nodes)
-    for u, v in edge_list_graph.edges:
-        matrix_graph.add_edge(u, v)
-    return matrix_graph
+    return GraphMatrix.from_edges(edge_list_graph.iter_edges(), num_nodes)
 
 def edge_list_to_adj_table(edge_list_graph):
-    adj_table_graph = GraphAdjTable()
-    for u, v in edge_list_graph.edges:
-        adj_table_graph.add_edge(u, v)
-    return adj_table_graph
+    return GraphAdjTable.from_edges(edge_list_graph.iter_edges(), edge_list_graph._num_nodes)
 
 def adj_table_to_matrix(adj_table_graph):
     nodes = adj_table_graph.get_all_nodes()
-    num_nodes = max(nodes) + 1  # Assuming nodes are 0-indexed
-    matrix_graph = GraphMatrix(num_nodes)
-    for u in adj_table_graph.adj:
-        for v in adj_table_graph.adj[u]:
-            matrix_graph.add_edge(u, v)
-    return matrix_graph
+    if nodes.identity:
+        return GraphMatrix.from_edges(adj_table_graph.iter_edges(), len(nodes))
+    if all(type(node) is int and node >= 0 for node in nodes):
+        return GraphMatrix.from_edges(adj_table_graph.iter_edges(), max(nodes) + 1)
+    # Labels that cannot be matrix indexes: rows and columns follow the dense ids instead
+    return GraphMatrix.from_edges(((u, v) for u, row in enumerate(adj_table_graph._out) for v in row), len(nodes))
 
 def adj_table_to_edge_list(adj_table_graph):
-    edge_list_graph = GraphEdgeList()
-    for u in adj_table_graph.adj:
-        for v in adj_table_graph.adj[u]:
-            edge_list_graph.add_edge(u, v)
-    return edge_list_graph
+    # The edge list can only pre-register nodes 0..n-1, other labels appear through their edges
+    nodes = adj_table_graph.nodes
+    return GraphEdgeList.from_edges(adj_table_graph.iter_edges(), len(nodes) if nodes.identity else None)
+
+def matrix_to_bit_matrix(matrix_graph):
+    return GraphBitMatrix.from_edges(matrix_graph.iter_edges(), matrix_graph.n)
+
+def bit_matrix_to_matrix(bit_matrix_graph):
+    return GraphMatrix.from_edges(bit_matrix_graph.iter_edges(), bit_matrix_graph.n)
 
 import random
 
-def generate_random_acyclic_graph(num_nodes, saturation):
+def iter_random_dag_edges(num_nodes, saturation, seed=None):
     """
-    Generates a random DAG (Directed Acyclic Graph) as a GraphMatrix object with a specific saturation.
+    Streams the edges of a random DAG, each pair (u, v) with u < v being picked with probability saturation.
+
+    Instead of listing all n(n-1)/2 candidate pairs it jumps over them with geometrically
+    distributed gaps (Batagelj-Brandes), so the work is proportional to the edges produced.
+    Edges come out ordered by target node.
 
     :param num_nodes: Number of nodes in the graph
-    :param saturation: Saturation level (0.0 to 1.0), representing the percentage of possible edges
-    :return: GraphMatrix object representing the DAG
+    :param saturation: Saturation level (0.0 to 1.0), the expected fraction of possible edges
+    :param seed: Seed for a private random generator, the same seed gives the same edges
+    :return: Generator of (u, v) tuples
     """
     if not (0.0 <= saturation <= 1.0):
         raise ValueError("Saturation must be between 0.0 and 1.0")
+    rng = random.Random(seed)
 
-    # For a DAG, only allow edges from lower to higher index (u < v)
-    possible_edges = [(u, v) for u in range(num_nodes) for v in range(u + 1, num_nodes)]
-    total_possible_edges = len(possible_edges)
-    num_edges = int(total_possible_edges * saturation)
+    if saturation == 0.0:
+        return
+    if saturation == 1.0:
+        for v in range(1, num_nodes):
+            for u in range(v):
+                yield u, v
+        return
 
-    # Randomly select edges to include
-    selected_edges = random.sample(possible_edges, num_edges)
+    # log1p keeps tiny saturations from rounding 1.0 - saturation to 1.0 and log_skip to 0
+    log_skip = math.log1p(-saturation)
+    # No skip needs to go past all the pairs, which also keeps a subnormal one finite
+    max_skip = num_nodes * num_nodes
+    u, v = -1, 1
+    while v < num_nodes:
+        u += 1 + int(min(math.log(1.0 - rng.random()) / log_skip, max_skip))
+        while u >= v and v < num_nodes:
+            u -= v
+            v += 1
+        if v < num_nodes:
+            yield u, v
 
-    # Build the GraphMatrix object
-    graph = GraphMatrix(num_nodes)
-    for u, v in selected_edges:
-        graph.add_edge(u, v)
+def generate_random_acyclic_graph(num_nodes, saturation, graph_type=None, seed=None):
+    """
+    Generates a random DAG (Directed Acyclic Graph) with a specific saturation, written straight into the requested backend.
 
-    return graph
+    :param num_nodes: Number of nodes in the graph
+    :param saturation: Saturation level (0.0 to 1.0), representing the percentage of possible edges
+    :param graph_type: Backend class to build (GraphMatrix by default)
+    :param seed: Seed for a reproducible graph
+    :return: Graph object representing the DAG
+    """
+    graph_type = graph_type or GraphMatrix
+    return graph_type.from_edges(iter_random_dag_edges(num_nodes, saturation, seed), num_nodes)
 
 
 
@@ -0,0 +1,249 @@
+#   Graph Input/Output
+import math
+import mmap
+import struct
+import sys
+from array import array
+from xml.sax.saxutils import quoteattr
+from graph import GraphCSR
+
+class ParseReport:
+    # Collects validation problems while parsing, so they are summarised once instead of printed per line
+    def __init__(self, max_examples=5):
+        self.max_examples = max_examples
+        self.lines = 0
+        self.edges = 0
+        self.bad_lines = 0
+        self.skipped_edges = 0
+        self.examples = []
+
+    def bad_line(self, line_number, line):
+        self.bad_lines += 1
+        self._example(f"line {line_number}: not a list of node numbers: {line.strip()[:40]}")
+
+    def skipped_edge(self, u, v):
+        self.skipped_edges += 1
+        self._example(f"disallowed connection {u} -> {v}")
+
+    def _example(self, message):
+        if len(self.examples) < self.max_examples:
+            self.examples.append(message)
+
+    def as_dict(self):
+        return {
+            "lines": self.lines,
+            "edges": self.edges,
+            "bad_lines": self.bad_lines,
+            "skipped_edges": self.skipped_edges,
+            "examples": list(self.examples),
+        }
+
+    def summary(self):
+        text = f"Read {self.lines} lines, {self.edges} edges"
+        skipped = []
+        if self.bad_lines:
+            skipped.append(f"{self.bad_lines} invalid lines")
+        if self.skipped_edges:
+            skipped.append(f"{self.skipped_edges} disallowed connections")
+        if skipped:
+            text += ", skipped " + " and ".join(skipped)
+            text += "".join(f"\n  {example}" for example in self.examples)
+            hidden = self.bad_lines + self.skipped_edges - len(self.examples)
+            if hidden > 0:
+                text += f"\n  ... and {hidden} more"
+        return text
+
+def parse_adjacency(stream, num_nodes=None, report=None, chunk_size=1 << 20):
+    """
+    Reads adjacency lines (line i lists the nodes that node i points to) from a text stream in chunks.
+
+    :param stream: File object or sys.stdin
+    :param num_nodes: Node count, if None it is the number of lines (trailing empty lines do not count)
+    :param report: ParseReport that collects invalid lines and connections
+    :param chunk_size: Number of characters read at a time
+    :return: (sources, targets, num_nodes), sources and targets being array('i') buffers
+    """
+    report = report if report is not None else ParseReport()
+    sources = array('i')
+    targets = array('i')
+    node = 0
+    empty_lines = 0
+    rest = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop() if chunk else ""
+        for line in lines:
+            if not line.strip():
+                empty_lines += 1
+                continue
+            node += empty_lines
+            empty_lines = 0
+            try:
+                row = array('i', map(int, line.replace(',', ' ').split()))
+            except (ValueError, OverflowError):
+                report.bad_line(node, line)
+                node += 1
+                continue
+            if row and node in row or min(row, default=0) < 0 or (num_nodes is not None and (node >= num_nodes or max(row, default=0) >= num_nodes)):
+                row = _drop_disallowed(row, node, num_nodes, report)
+            sources.extend(array('i', [node]) * len(row))
+            targets.extend(row)
+            node += 1
+        if not chunk:
+            break
+    report.lines = node
+
+    if num_nodes is None:
+        # Only now we know how many nodes there are, drop connections past the last one
+        num_nodes = node
+        if targets and max(targets) >= num_nodes:
+            kept_sources = array('i')
+            kept_targets = array('i')
+            for u, v in zip(sources, targets):
+                if v < num_nodes:
+                    kept_sources.append(u)
+                    kept_targets.append(v)
+                else:
+                    report.skipped_edge(u, v)
+            sources, targets = kept_sources, kept_targets
+    report.edges = len(targets)
+    return sources, targets, num_nodes
+
+def _drop_disallowed(row, node, num_nodes, report):
+    kept = array('i')
+    for v in row:
+        if v >= 0 and v != node and (num_nodes is None or (node < num_nodes and v < num_nodes)):
+            kept.append(v)
+        else:
+            report.skipped_edge(node, v)
+    return kept
+
+def load_adjacency(stream, graph_class, num_nodes=None, report=None):
+    # Parses the stream straight into the bulk builder of graph_class
+    sources, targets, num_nodes = parse_adjacency(stream, num_nodes, report)
+    return graph_class.from_arrays(sources, targets, num_nodes)
+
+
+# Every writer walks get_all_nodes() and iter_edges() of the backend once and writes
+# line by line to a file-like object, so nothing proportional to the graph is kept in memory.
+
+def write_tikz(graph, out):
+    nodes = graph.get_all_nodes()
+    out.write("\\begin{tikzpicture}[->,>=stealth,shorten >=1pt,auto,node distance=2cm, thick, main node/.style={circle,draw}]\n")
+
+    # Umieszczamy wierzchołki na okręgu
+    angle_step = 360 / len(nodes) if len(nodes) else 0
+    for i in nodes:
+        angle = i * angle_step
+        x = round(5 * math.cos(math.radians(angle)), 2)
+        y = round(5 * math.sin(math.radians(angle)), 2)
+        out.write(f"\\node[main node] ({i}) at ({x},{y}) {{{i}}};\n")
+
+    for u, v in graph.iter_edges():
+        out.write(f"\\path[->] ({u}) edge ({v});\n")
+
+    out.write("\\end{tikzpicture}\n")
+
+def _dot_id(label):
+    # DOT quoted ids end at an unescaped quote, so backslashes and quotes are escaped
+    return '"' + str(label).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def write_dot(graph, out):
+    out.write("digraph G {\n")
+    for node in graph.get_all_nodes():
+        out.write(f"  {_dot_id(node)};\n")
+    for u, v in graph.iter_edges():
+        out.write(f"  {_dot_id(u)} -> {_dot_id(v)};\n")
+    out.write("}\n")
+
+def write_graphml(graph, out):
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    out.write('  <graph id="G" edgedefault="directed">\n')
+    for node in graph.get_all_nodes():
+        out.write(f"    <node id={quoteattr(str(node))}/>\n")
+    for u, v in graph.iter_edges():
+        out.write(f"    <edge source={quoteattr(str(u))} target={quoteattr(str(v))}/>\n")
+    out.write("  </graph>\n")
+    out.write("</graphml>\n")
+
+def write_edge_list(graph, out):
+    for u, v in graph.iter_edges():
+        out.write(f"{u} {v}\n")
+
+EXPORT_FORMATS = {
+    "tikz": ("TikZ", write_tikz),
+    "dot": ("DOT", write_dot),
+    "graphml": ("GraphML", write_graphml),
+    "edge_list": ("edge list", write_edge_list),
+}
+
+def export_graph(graph, out, fmt="tikz"):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}. Allowed formats: {', '.join(EXPORT_FORMATS)}")
+    EXPORT_FORMATS[fmt][1](graph, out)
+
+
+# Binary format: a 32-byte header (magic, version, flags, node count, edge count)
+# followed by the CSR offsets (n + 1 values) and targets (m values) as little-endian int32
+GRAPH_FILE_MAGIC = b"AISDCSR\0"
+GRAPH_FILE_VERSION = 1
+GRAPH_FILE_HEADER = struct.Struct("<8sIIQQ")
+FLAG_SORTED_ROWS = 1
+
+def _graph_arrays(graph):
+    if graph._label_map() is not None:
+        raise ValueError("The binary format stores nodes 0..n-1 only, this graph has other node labels")
+    csr = graph.freeze()
+    offsets, targets = csr.offsets, csr.targets
+    if sys.byteorder != "little":
+        offsets, targets = array('i', offsets), array('i', targets)
+        offsets.byteswap()
+        targets.byteswap()
+    header = GRAPH_FILE_HEADER.pack(GRAPH_FILE_MAGIC, GRAPH_FILE_VERSION, FLAG_SORTED_ROWS, csr.n, len(csr.targets))
+    return header, offsets, targets
+
+def _graph_from_buffer(data, name):
+    # data is anything with the buffer protocol, the returned graph keeps views into it
+    if len(data) < GRAPH_FILE_HEADER.size:
+        raise ValueError(f"{name} is not a graph file: too short")
+    magic, version, flags, num_nodes, num_edges = GRAPH_FILE_HEADER.unpack_from(data)
+    if magic != GRAPH_FILE_MAGIC:
+        raise ValueError(f"{name} is not a graph file: bad magic number")
+    if version != GRAPH_FILE_VERSION:
+        raise ValueError(f"{name} has unsupported graph file version {version}")
+    itemsize = array('i').itemsize
+    offsets_end = GRAPH_FILE_HEADER.size + itemsize * (num_nodes + 1)
+    if len(data) != offsets_end + itemsize * num_edges:
+        raise ValueError(f"{name} is truncated or has trailing data")
+
+    view = memoryview(data)
+    offsets = view[GRAPH_FILE_HEADER.size:offsets_end].cast('i')
+    targets = view[offsets_end:].cast('i')
+    if sys.byteorder != "little":
+        offsets, targets = array('i', offsets), array('i', targets)
+        offsets.byteswap()
+        targets.byteswap()
+    return GraphCSR(offsets, targets)
+
+def save_graph(graph, path):
+    header, offsets, targets = _graph_arrays(graph)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(offsets)
+        f.write(targets)
+
+def load_graph(path):
+    # Maps the file read-only and hands its buffers to GraphCSR without copying them
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _graph_from_buffer(data, path)
+
+def dumps_graph(graph):
+    # Same layout as save_graph(), as bytes: a compact form to ship graphs between processes
+    header, offsets, targets = _graph_arrays(graph)
+    return b"".join((header, offsets, targets))
+
+def loads_graph(data):
+    return _graph_from_buffer(data, "data")
@@ -1,7 +1,11 @@
 import argparse
+import json
 import sys
 import os
-from graph import Graph, GraphAdjTable, GraphMatrix, GraphEdgeList, matrix_to_adj_table, matrix_to_edge_list, edge_list_to_matrix, edge_list_to_adj_table, adj_table_to_matrix, adj_table_to_edge_list, generate_random_acyclic_graph
+from array import array
+from batch import load_script, run_job, run_pool
+from graph_io import EXPORT_FORMATS, ParseReport, parse_adjacency
+from graph import Graph, GraphCSR, GraphAdjTable, GraphMatrix, GraphBitMatrix, GraphEdgeList, generate_random_acyclic_graph
 
 def help():
     print("\nCommands:")
@@ -12,32 +16,40 @@ def help():
     print("  BFS    > perform Breadth First Search")
     print("  Kahn   > sort the graph using Kahn's algorithm")
     print("  Tarjan > sort the graph using Tarjan's algorithm")
-    print("  Export > Export the graph to tickzpicture")
+    print("  Export > Export the graph to TikZ, DOT, GraphML or an edge list")
+    print("  Save   > Save the graph to a binary file (open it with --load)")
+    print("  Stats  > Turn on call counting and timing, then show the numbers")
+    print("  Stats memory > Same, with peak memory per run (makes the times slower)")
     print("  Exit   > Exits the program\n")
 
 graph = Graph()
 
-def generate_matrix(nodes, saturation):
+def generate_matrix(nodes, saturation, seed=None):
     # Generowanie grafu
     global graph
     print(f"Generating graph with {nodes} nodes and {saturation}% saturation.")
-    graph = generate_random_acyclic_graph(nodes, saturation/100)
+    graph = generate_random_acyclic_graph(nodes, saturation/100, GraphMatrix, seed)
     graph.display()
 
-def generate_edge_list(nodes, saturation):
+def generate_edge_list(nodes, saturation, seed=None):
     # Generowanie grafu
     global graph
     print(f"Generating graph with {nodes} nodes and {saturation}% saturation.")
-    graph = generate_random_acyclic_graph(nodes, saturation/100)
-    graph = matrix_to_edge_list(graph)
+    graph = generate_random_acyclic_graph(nodes, saturation/100, GraphEdgeList, seed)
     graph.display()
 
-def generate_adjacency_table(nodes, saturation):
+def generate_adjacency_table(nodes, saturation, seed=None):
     # Generowanie grafu
     global graph
     print(f"Generating graph with {nodes} nodes and {saturation}% saturation.")
-    graph = generate_random_acyclic_graph(nodes, saturation/100)
-    graph = matrix_to_adj_table(graph)
+    graph = generate_random_acyclic_graph(nodes, saturation/100, GraphAdjTable, seed)
+    graph.display()
+
+def generate_bit_matrix(nodes, saturation, seed=None):
+    # Generowanie grafu
+    global graph
+    print(f"Generating graph with {nodes} nodes and {saturation}% saturation.")
+    graph = generate_random_acyclic_graph(nodes, saturation/100, GraphBitMatrix, seed)
     graph.display()
 
 def exit():
@@ -90,21 +102,39 @@ def tarjan():
 
 def export():
     global graph
-    graph.export()
+    while True:
+        fmt = input("format (tikz, dot, graphml, edge_list)> ").strip().lower().replace(" ", "_") or "tikz"
+        if fmt in EXPORT_FORMATS:
+            break
+        print(f"Invalid format. Allowed formats: {', '.join(EXPORT_FORMATS)}")
+    path = input("file (empty for screen)> ").strip()
+    if path:
+        with open(path, 'w') as f:
+            graph.export(f, fmt)
+        print(f"Graph exported to {path}")
+    else:
+        graph.export(fmt=fmt)
 
-def parse_graph_input(connections, num_nodes):
-    # Parsowanie danych wejściowych na połączenia
-    valid_connections = []
-    for node_from, node_to in connections:
-        if 1 <= node_from <= num_nodes and 1 <= node_to <= num_nodes and node_from != node_to:
-            valid_connections.append((node_from, node_to))
-        else:
-            print(f"Warning: Invalid connection {node_from}-{node_to}, skipping.")
-    
-    return valid_connections 
+def save():
+    global graph
+    path = input("file> ").strip()
+    if path:
+        graph.save(path)
+        print(f"Graph saved to {path}")
+
+def stats(trace_memory=False):
+    global graph
+    if trace_memory or not graph.stats_enabled():
+        # Domyślnie bez tracemalloc, inaczej zmierzone czasy są kilka razy zawyżone;
+        # 'stats memory' włącza go, zebrane dotąd liczby zostają
+        graph.enable_stats(trace_memory=trace_memory)
+        extra = " with peak memory (times are inflated while it is on)" if trace_memory else ""
+        print(f"Statistics enabled{extra}. Run some actions and type 'stats' again to see them.")
+        return
+    print(graph.stats.report())
 
 def user_provided_from_stdin():
-    connections = []
+    sources, targets = array('i'), array('i')
 
     if os.isatty(sys.stdin.fileno()):
         # Interaktywny tryb
@@ -125,45 +155,39 @@ def user_provided_from_stdin():
                     # Sprawdź poprawność
                     if all(0 <= n < nodes and n != i for n in conn_nodes):
                         for n in conn_nodes:
-                            connections.append((i, n))
+                            sources.append(i)
+                            targets.append(n)
                         break  # poprawne dane
                     else:
                         print(f"Niedozwolone połączenia. Możesz łączyć tylko z node'ami od 0 do {nodes-1}, bez połączeń do siebie ({i}).")
                 except ValueError:
                     print("Podaj tylko liczby oddzielone spacją lub przecinkiem.")
     else:
-        # Heredoc – dane z stdin
+        # Heredoc – dane z stdin, czytane kawałkami
         print("Tryb heredoc – wczytywanie danych z stdin.")
-        lines = sys.stdin.read().strip().splitlines()
-        nodes = len(lines)
-        for i, line in enumerate(lines):
-            raw = line.strip()
-            try:
-                conn_nodes = list(map(int, raw.split()))
-                for n in conn_nodes:
-                    if 0 <= n < nodes and n != i:
-                        connections.append((i, n))
-                    else:
-                        print(f"Pominięto niedozwolone połączenie: {i} → {n}")
-            except ValueError:
-                print(f"Pominięto nieprawidłowe dane w linii {i}: {line}")
-    print(connections)
+        report = ParseReport()
+        sources, targets, nodes = parse_adjacency(sys.stdin, report=report)
+        print(report.summary())
 
-    # Pytamy o typ grafu na końcu
-    sys.stdin = open('/dev/tty')
-    graph_type = input("Type> ").strip().lower().replace(" ", "_")
-    return graph_type, nodes, connections
+    # Pytamy o typ grafu na końcu, chyba że podano --type
+    if args.type:
+        graph_type = args.type
+    else:
+        sys.stdin = open('/dev/tty')
+        graph_type = input("Type> ").strip().lower().replace(" ", "_")
+    return graph_type, nodes, (sources, targets)
 
 def user_provided_from_file(file_path):
-    # Wczytuje dane z pliku
+    # Wczytuje dane z pliku: typ grafu, liczba węzłów, potem linia połączeń dla każdego węzła
     print(f"Wczytywanie danych z pliku: {file_path}")
     try:
         with open(file_path, 'r') as f:
             graph_type = f.readline().strip().lower()  # Typ grafu w pierwszej linii
             nodes = int(f.readline().strip())  # Liczba węzłów w drugiej linii
-            input_data = f.read()
-        connections = parse_graph_input(input_data, nodes)
-        return graph_type, nodes, connections
+            report = ParseReport()
+            sources, targets, nodes = parse_adjacency(f, nodes, report)
+        print(report.summary())
+        return graph_type, nodes, (sources, targets)
     except FileNotFoundError:
         print(f"Błąd: Plik {file_path} nie istnieje.")
         sys.exit(1)
@@ -173,16 +197,55 @@ parser = argparse.ArgumentParser()
 parser.add_argument('--user-provided', action='store_true')
 parser.add_argument('--generate', action='store_true')
 parser.add_argument('--file', type=str, help='Path to the input file')
+parser.add_argument('--load', type=str, help='Path to a binary graph file written by the save command')
+parser.add_argument('--seed', type=int, help='Seed for --generate, the same seed gives the same graph')
+parser.add_argument('--type', type=str, help='Graph type, skips the Type> prompt (matrix, bit_matrix, edge_list, adjacency_table)')
+parser.add_argument('--nodes', type=int, help='Node count for --generate, skips the nodes> prompt')
+parser.add_argument('--saturation', type=int, help='Saturation (0-100) for --generate, skips the saturation> prompt')
+parser.add_argument('--actions', type=str, help='Batch mode: comma separated actions, e.g. "kahn,tarjan,bfs:0,find:0:1,export:dot"')
+parser.add_argument('--script', type=str, help='Batch mode: JSON file with a list of {"graph": ..., "actions": [...]} jobs')
+parser.add_argument('--workers', type=int, help='Batch mode: run the jobs on this many processes')
 args = parser.parse_args()
 
-selected_args = sum([args.user_provided, args.generate])
+# Tryb wsadowy – bez żadnych pytań, wyniki jako JSON na stdout
+if args.actions is not None or args.script:
+    if args.script:
+        jobs = load_script(args.script)
+    else:
+        if args.generate:
+            spec = {"source": "generate", "type": args.type or "matrix", "nodes": args.nodes,
+                    "saturation": args.saturation if args.saturation is not None else 50, "seed": args.seed}
+            if args.nodes is None:
+                print("Błąd: --generate w trybie wsadowym wymaga --nodes")
+                sys.exit(1)
+        elif args.load:
+            spec = {"source": "binary", "path": args.load}
+        elif args.user_provided and args.file:
+            spec = {"source": "file", "path": args.file}
+            if args.type:
+                spec["type"] = args.type
+        elif args.user_provided:
+            spec = {"source": "stdin", "type": args.type or "matrix"}
+        else:
+            print("Błąd: Musisz podać jeden z argumentów: --user-provided, --generate lub --load")
+            sys.exit(1)
+        jobs = [(spec, [action for action in args.actions.split(",") if action.strip()])]
+    if args.workers:
+        output = run_pool(jobs, args.workers)
+    else:
+        output = {"jobs": [run_job(spec, actions) for spec, actions in jobs]}
+    json.dump(output, sys.stdout)
+    print()
+    sys.exit(0 if all("error" not in job for job in output["jobs"]) else 1)
+
+selected_args = sum([args.user_provided, args.generate, bool(args.load)])
 
 # Sprawdzenie poprawności argumentów
 if selected_args == 0:
-    print("Błąd: Musisz podać jeden z argumentów: --user-provided lub --generate")
+    print("Błąd: Musisz podać jeden z argumentów: --user-provided, --generate lub --load")
     sys.exit(1)
 elif selected_args > 1:
-    print("Błąd: Nie możesz podać obu argumentów jednocześnie. Wybierz tylko jeden z: --user-provided lub --generate")
+    print("Błąd: Nie możesz podać obu argumentów jednocześnie. Wybierz tylko jeden z: --user-provided, --generate lub --load")
     sys.exit(1)
 
 # Jeśli użytkownik podał dane
@@ -196,54 +259,68 @@ if args.user_provided:
 
     # Tworzymy graf na podstawie podanych danych
     if graph_type == "matrix":
-        graph = GraphMatrix(nodes)
+        graph_class = GraphMatrix
+    elif graph_type == "bit_matrix":
+        graph_class = GraphBitMatrix
     elif graph_type == "edge_list":
-        graph = GraphEdgeList(nodes)
+        graph_class = GraphEdgeList
     elif graph_type == "adjacency_table":
-        graph = GraphAdjTable(nodes)
+        graph_class = GraphAdjTable
     else:
         print(f"Unknown graph type: {graph_type}")
         sys.exit(1)
 
-    # Dodajemy połączenia
-    for node_from, node_to in connections:
-        graph.add_edge(node_from, node_to)
+    # Dodajemy połączenia jednym przebiegiem
+    graph = graph_class.from_arrays(*connections, nodes)
     
     graph.display()
 
 elif args.generate:
     # Generowanie danych
     print("Dane zostaną wygenerowane automatycznie.")
-    allowed_types = {"matrix", "edge_list", "adjacency_table"}
-    while True:
+    allowed_types = {"matrix", "bit_matrix", "edge_list", "adjacency_table"}
+    # Wartości podane flagami nie są pytane ponownie
+    type_input = args.type
+    while type_input not in allowed_types:
+        if type_input is not None:
+            print(f"Invalid type. Allowed types: {', '.join(allowed_types)}")
         type_input = input("Type> ").strip().lower().replace(" ", "_")
-        if type_input in allowed_types:
-            break
-        print(f"Invalid type. Allowed types: {', '.join(allowed_types)}")
     
-    while True:
+    nodes = args.nodes
+    while nodes is None:
         try:
             nodes = int(input("nodes> "))
-            break
         except:
             print("Invalid input. Please enter an integer.")
-    while True:
+    saturation = args.saturation
+    if saturation is not None and not 0 <= saturation <= 100:
+        print("Saturation must be between 0 and 100.")
+        saturation = None
+    while saturation is None:
         try:
             saturation = int(input("saturation> "))
             if saturation < 0 or saturation > 100:
                 print("Saturation must be between 0 and 100.")
-                continue
-            break
+                saturation = None
         except:
             print("Invalid input. Please enter an integer.")
     match type_input:
-        case "matrix" | "edge_list" | "adjacency_table":
-            globals()[f"generate_{type_input}"](nodes, saturation)
+        case "matrix" | "bit_matrix" | "edge_list" | "adjacency_table":
+            globals()[f"generate_{type_input}"](nodes, saturation, args.seed)
         case _:
             print(f"Unknown type: {type_input}")
 
+elif args.load:
+    # Plik binarny jest mapowany do pamięci, bez parsowania
+    try:
+        graph = GraphCSR.load(args.load)
+    except (OSError, ValueError) as e:
+        print(f"Błąd: {e}")
+        sys.exit(1)
+    print(f"Loaded graph with {graph.n} nodes and {len(graph.targets)} edges from {args.load}")
+
 else:
-    print("Musisz podać jeden z argumentów: --user-provided lub --generate")
+    print("Musisz podać jeden z argumentów: --user-provided, --generate lub --load")
 
 # Wykonywanie komend po wybraniu
 while True:
@@ -251,7 +328,9 @@ while True:
     action = input("Action> ").strip().lower()
     
     match action:
-        case "help" | "print" | "find" | "depth-first search" | "breadth-first search" | "kahn" | "tarjan" | "export" | "exit":
+        case "help" | "print" | "find" | "depth-first search" | "breadth-first search" | "kahn" | "tarjan" | "export" | "save" | "stats" | "exit":
             globals()[action.replace(" ", "_").replace("-","_")]() if action != "print" else print_graph()
+        case "stats memory":
+            stats(trace_memory=True)
         case _:
             print("Invalid command. Type 'help' for a list of available commands.")
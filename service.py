@@ -0,0 +1,254 @@
+#   Graph Service
+# Keeps named graphs in memory and answers JSON-lines requests from many clients at once,
+# over TCP or a Unix socket. Every request is one JSON object per line, every response
+# is one line carrying the same "id", so answers may come back out of order.
+#
+#   python service.py --port 8765 --load big=graph.bin
+#   python service.py --unix /tmp/graphs.sock
+#
+#   {"id": 1, "op": "load", "name": "g", "graph": {"source": "generate", "nodes": 1000, "saturation": 5}}
+#   {"id": 2, "op": "has_edge", "name": "g", "u": 0, "v": 1}
+#   {"id": 3, "op": "neighbors", "name": "g", "u": 0}
+#   {"id": 4, "op": "bfs", "name": "g", "start": 0}     also dfs, kahn, tarjan, export (with "format")
+#   {"id": 5, "op": "predecessors", "name": "g", "u": 7}, {"op": "ancestors", "name": "g", "u": 7}
+#   {"id": 6, "op": "list"}, {"op": "drop", "name": "g"}, {"op": "ping"}
+#
+# Graph specs are the ones of batch.build_graph(), except stdin. Lookups are answered on
+# the event loop; traversals, sorts and exports run batch.run_action() in a process pool,
+# which gets the graph as dumps_graph() bytes and keeps it parsed between requests.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from batch import build_graph, check_node, run_action
+from graph import GraphCycleError
+from graph_io import EXPORT_FORMATS, dumps_graph, loads_graph
+
+POOL_OPS = ("bfs", "dfs", "kahn", "tarjan", "export", "ancestors")
+# Requests of one client processed at the same time, reading stops until one finishes
+MAX_PENDING = 256
+# Graphs each worker process keeps parsed, the oldest one goes first
+WORKER_GRAPHS = 8
+
+_worker_graphs = {}
+
+def _run_in_worker(key, payload, action):
+    # key is (name, generation), so a reloaded graph never hits a stale copy
+    graph = _worker_graphs.get(key)
+    if graph is None:
+        if len(_worker_graphs) >= WORKER_GRAPHS:
+            del _worker_graphs[next(iter(_worker_graphs))]
+        graph = _worker_graphs[key] = loads_graph(payload)
+    return run_action(graph, action)
+
+def _freeze_for_serving(graph):
+    # The frozen copy answers predecessors, so its transpose is built here as well,
+    # off the event loop, instead of on the first request
+    frozen = graph.freeze()
+    frozen._cached("reverse", frozen._transpose)
+    return frozen
+
+def _warm_up():
+    return os.getpid()
+
+def _worker_context():
+    # Workers must not be forked from the serving process: a fork taken while clients are
+    # connected inherits their sockets, and closing a connection then sends no FIN while a
+    # worker still holds it. forkserver forks them from a clean helper process instead.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def _pool_action(op, request):
+    # Turns a request into a batch action string
+    if op in ("bfs", "dfs"):
+        return f"{op}:{int(request.get('start', 0))}"
+    if op == "ancestors":
+        return f"ancestors:{int(request['u'])}"
+    if op == "export":
+        fmt = request.get("format", "tikz")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}. Allowed formats: {', '.join(EXPORT_FORMATS)}")
+        return f"export:{fmt}"
+    return op
+
+
+class GraphService:
+    def __init__(self, workers=None):
+        self.graphs = {}
+        # name -> frozen CSR copy, made while loading so no thread touches a published graph
+        self._frozen = {}
+        # name -> (generation, dumps_graph bytes), made on the first pool request
+        self._payloads = {}
+        self._generation = 0
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context())
+        self.requests = 0
+
+    async def start(self):
+        # Starts the worker machinery before the first client connects
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, _warm_up)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def _graph(self, request):
+        name = request.get("name")
+        if name not in self.graphs:
+            raise KeyError(f"no graph named {name!r}")
+        return name, self.graphs[name]
+
+    async def load(self, name, spec):
+        if spec.get("source") == "stdin":
+            raise ValueError("The service has no stdin, use a file or binary source")
+        # Parsing or generating can take a while, keep it off the event loop. Freezing
+        # there as well also builds any lazy index (the edge list's) before the graph
+        # is published, later lookups on the loop only read it.
+        graph, info = await asyncio.to_thread(build_graph, spec)
+        # Requests address nodes by int and workers get the CSR numbering, both need plain ids
+        if graph._label_map() is not None:
+            raise ValueError("The service needs nodes numbered 0..n-1, this graph has other node labels")
+        frozen = await asyncio.to_thread(_freeze_for_serving, graph)
+        self.graphs[name] = graph
+        self._frozen[name] = frozen
+        self._payloads.pop(name, None)
+        return dict(info, name=name, node_count=len(graph.get_all_nodes()))
+
+    async def _payload(self, name, graph):
+        if name not in self._payloads:
+            self._generation += 1
+            generation = self._generation
+            # Serialized from the immutable CSR copy, never from the graph the loop is reading
+            payload = await asyncio.to_thread(dumps_graph, self._frozen[name])
+            # The graph may have been replaced while we were serializing it
+            if self.graphs.get(name) is not graph:
+                raise KeyError(f"graph {name!r} was replaced, try again")
+            self._payloads[name] = (generation, payload)
+        return self._payloads[name]
+
+    async def dispatch(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return "pong"
+        if op == "list":
+            return {name: len(graph.get_all_nodes()) for name, graph in self.graphs.items()}
+        if op == "load":
+            return await self.load(request["name"], request["graph"])
+        if op == "drop":
+            name, _ = self._graph(request)
+            del self.graphs[name]
+            del self._frozen[name]
+            self._payloads.pop(name, None)
+            return True
+
+        name, graph = self._graph(request)
+        if op == "has_edge":
+            return bool(graph.has_edge(check_node(graph, request["u"]), check_node(graph, request["v"])))
+        if op == "neighbors":
+            return list(graph.get_neighbors(check_node(graph, request["u"])))
+        if op == "predecessors":
+            # From the frozen copy: the live graph may have to scan every edge for it
+            return list(self._frozen[name].get_predecessors(check_node(graph, request["u"])))
+        if op == "node_count":
+            return len(graph.get_all_nodes())
+        if op in POOL_OPS:
+            action = _pool_action(op, request)
+            generation, payload = await self._payload(name, graph)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _run_in_worker, (name, generation), payload, action)
+        raise ValueError(f"Unknown op: {op}")
+
+    async def handle_line(self, line):
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {"error": f"invalid request: {e}"}
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = await self.dispatch(request)
+        except GraphCycleError as e:
+            response["error"] = str(e)
+            response["edge"] = e.edge
+        except (OSError, ValueError, IndexError, KeyError, TypeError) as e:
+            response["error"] = f"{type(e).__name__}: {e}"
+        return response
+
+    async def handle_client(self, reader, writer):
+        pending = asyncio.Semaphore(MAX_PENDING)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            try:
+                response = await self.handle_line(line)
+                async with write_lock:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+            finally:
+                pending.release()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await pending.acquire()
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # The client closed its side, finish what it already asked for
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(args):
+    service = GraphService(args.workers)
+    await service.start()
+    for item in args.load or ():
+        name, _, path = item.partition("=")
+        await service.load(name, {"source": "binary", "path": path})
+        print(f"Loaded {name} from {path}", file=sys.stderr)
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle_client, args.unix, limit=1 << 24)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(service.handle_client, args.host, args.port, limit=1 << 24)
+        where = f"{args.host}:{args.port}"
+    print(f"Serving on {where} with {args.workers or os.cpu_count()} workers", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve graph queries over a JSON-lines socket")
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', type=str, help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, help='Processes for traversals and sorts, os.cpu_count() by default')
+    parser.add_argument('--load', type=str, action='append', help='NAME=PATH of a binary graph file to load at start')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())